@@ -0,0 +1,265 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from static import WIDTH, HEIGHT
+
+BENCH_VERSION = 1
+DEFAULT_THRESHOLD = 0.10
+
+
+# -------------------------------------------------------------------
+# 1) HELPERS
+# -------------------------------------------------------------------
+def timings(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start_t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start_t)
+    return times
+
+
+def result(value, unit, better="lower", **extra):
+    """One benchmark entry: ``value`` is what --compare looks at."""
+    return {"value": value, "unit": unit, "better": better, **extra}
+
+
+def quiet():
+    """Silence the progress prints of the code under test."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+# -------------------------------------------------------------------
+# 2) BENCHMARKS
+# -------------------------------------------------------------------
+def bench_render(seed, repeat):
+    from map_drawer import load_features, render_entire_map, load_or_render_map
+    from map_cache import MapCache
+
+    load_features()
+    cold = timings(lambda: render_entire_map(seed), repeat)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = MapCache(cache_dir)
+        with quiet():
+            load_or_render_map(seed, cache)
+            cached = timings(lambda: load_or_render_map(seed, cache), repeat)
+    return {
+        "render_entire_map.cold": result(min(cold), "s", runs=cold),
+        "render_entire_map.cached": result(min(cached), "s", runs=cached),
+    }
+
+
+def bench_hatching(repeat):
+    from map_drawer import load_features
+    from hatching import hatch_rings
+
+    features = load_features()
+    coords = features.ring_xy.astype(np.int64)
+    n_segments = 0
+
+    def run():
+        nonlocal n_segments
+        n_segments = 0
+        for angle in (45, -45):
+            segments, _ = hatch_rings(coords, features.ring_offsets, 10, angle)
+            n_segments += len(segments)
+
+    best = min(timings(run, repeat))
+    return {
+        "hatching.rings_per_s": result(2 * features.n_rings / best, "rings/s", "higher"),
+        "hatching.segments_per_s": result(n_segments / best, "segments/s", "higher", segments=n_segments),
+    }
+
+
+def bench_routes(seed, n_routes):
+    from map_drawer import create_path
+    from routing import NoPath, get_router
+
+    with quiet():
+        get_router()
+    random.seed(seed)
+    done = failed = 0
+    start_t = time.perf_counter()
+    with quiet():
+        while done < n_routes:
+            try:
+                create_path()
+                done += 1
+            except NoPath:
+                failed += 1
+    elapsed = time.perf_counter() - start_t
+    return {"create_path.routes_per_s": result(done / elapsed, "routes/s", "higher", no_path=failed)}
+
+
+def bench_markers(seed, counts, repeat):
+    from markers import generate_random_markers
+
+    results = {}
+    for count in counts:
+        with quiet():
+            runs = timings(lambda: generate_random_markers(count, seed=seed), repeat)
+        results[f"generate_random_markers.{count}"] = result(min(runs), "s", runs=runs)
+    return results
+
+
+def bench_frames(seed, frames, warmup):
+    import game_loop
+    from profiler import profiler
+
+    profiler.window = warmup + frames
+    profiler.samples = {}
+    # A fresh tile cache, so timings don't depend on what earlier runs left on disk.
+    with tempfile.TemporaryDirectory() as cache_dir, quiet():
+        game_loop.main(seed=seed, max_frames=warmup + frames, fps=0, cache_dir=cache_dir)
+    frame_ms = [t * 1000 for t in list(profiler.samples["frame"])[warmup:]]
+    frame_ms.sort()
+    return {
+        "frame.p50": result(frame_ms[len(frame_ms) // 2], "ms"),
+        "frame.p95": result(frame_ms[int(0.95 * (len(frame_ms) - 1))], "ms"),
+        "frame.p99": result(frame_ms[int(0.99 * (len(frame_ms) - 1))], "ms"),
+        "frame.mean": result(statistics.fmean(frame_ms), "ms", frames=len(frame_ms)),
+    }
+
+
+def bench_fleet(seed, vehicles, ticks=300):
+    from fleet import Fleet
+    from simulation import SIM_HZ, random_routes
+
+    with quiet():
+        routes = random_routes(500, seed)
+    fleet = Fleet(routes, vehicles, seed=seed)
+    step = timings(lambda: fleet.step(1.0 / SIM_HZ), ticks)
+    viewport = pygame.Rect(0, 0, WIDTH, HEIGHT)
+    centers = fleet.xy[:200].astype(int).tolist()
+    cull = timings(lambda: [fleet.visible(viewport.move(x - WIDTH // 2, y - HEIGHT // 2)) for x, y in centers], 3)
+    return {
+        f"fleet.{vehicles}.tick": result(statistics.median(step) * 1000, "ms"),
+        f"fleet.{vehicles}.cull": result(min(cull) / len(centers) * 1e6, "us"),
+    }
+
+
+def bench_fleet_frames(seed, vehicles, frames, warmup):
+    import game_loop
+    from profiler import profiler
+
+    profiler.window = warmup + frames
+    profiler.samples = {}
+    with tempfile.TemporaryDirectory() as cache_dir, quiet():
+        game_loop.main(seed=seed, max_frames=warmup + frames, fps=0, fleet_size=vehicles, cache_dir=cache_dir)
+    frame_ms = sorted(t * 1000 for t in list(profiler.samples["frame"])[warmup:])
+    return {
+        f"fleet.{vehicles}.frame.p50": result(frame_ms[len(frame_ms) // 2], "ms"),
+        f"fleet.{vehicles}.frame.p95": result(frame_ms[int(0.95 * (len(frame_ms) - 1))], "ms"),
+    }
+
+
+SUITES = ("render", "hatching", "routes", "markers", "frames", "fleet")
+
+
+def run(suites, seed=0, repeat=3, routes=50, marker_counts=(100, 400, 1000), frames=300, warmup=30,
+        vehicles=5000):
+    pygame.init()
+    results = {}
+    for suite in suites:
+        start_t = time.perf_counter()
+        if suite == "render":
+            results.update(bench_render(seed, repeat))
+        elif suite == "hatching":
+            results.update(bench_hatching(repeat))
+        elif suite == "routes":
+            results.update(bench_routes(seed, routes))
+        elif suite == "markers":
+            results.update(bench_markers(seed, marker_counts, repeat))
+        elif suite == "frames":
+            results.update(bench_frames(seed, frames, warmup))
+        elif suite == "fleet":
+            results.update(bench_fleet(seed, vehicles))
+            results.update(bench_fleet_frames(seed, vehicles, frames, warmup))
+        print(f"{suite}: done in {time.perf_counter() - start_t:.1f} s", file=sys.stderr)
+    return {
+        "version": BENCH_VERSION,
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__,
+            "seed": seed,
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+# -------------------------------------------------------------------
+# 3) COMPARE
+# -------------------------------------------------------------------
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    """Print a side-by-side table; return the names that got worse by more than ``threshold``."""
+    regressions = []
+    names = sorted(set(base["results"]) | set(new["results"]))
+    width = max(len(name) for name in names)
+    print(f"{'benchmark':<{width}} {'base':>12} {'new':>12} {'change':>8}")
+    for name in names:
+        a = base["results"].get(name)
+        b = new["results"].get(name)
+        if a is None or b is None:
+            print(f"{name:<{width}} {'-' if a is None else a['value']:>12} {'-' if b is None else b['value']:>12}")
+            continue
+        change = (b["value"] - a["value"]) / a["value"] if a["value"] else 0.0
+        worse = change > threshold if b["better"] == "lower" else change < -threshold
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:<{width}} {a['value']:>12.4g} {b['value']:>12.4g} {change:>+8.1%}{flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks with fixed seeds and JSON output.")
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help="run only this suite (repeatable); default is all")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--routes", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--vehicles", type=int, default=5000)
+    parser.add_argument("--out", help="write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="compare two result files; exits 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        sys.exit(1 if compare(base, new, args.threshold) else 0)
+
+    report = run(args.suite or SUITES, args.seed, args.repeat, args.routes, frames=args.frames,
+                 vehicles=args.vehicles)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
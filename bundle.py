@@ -0,0 +1,86 @@
+import json
+import struct
+
+import numpy as np
+from geometry_store import GeometryStore
+from road_graph import RoadGraph
+from static import BUNDLE_FILE
+
+_MAGIC = b"YTBNDL01"
+_PREFIX = struct.Struct("<8sQ")
+_ALIGN = 64
+
+ROAD_ARRAYS = ("node_ids", "node_lonlat", "indptr", "indices", "lengths")
+STORE_ARRAYS = ("ring_coords", "ring_offsets", "feature_offsets", "layer_offsets", "feature_rows")
+
+
+def _aligned(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_bundle(path, arrays, meta=None):
+    """Write named NumPy arrays into one file laid out for ``np.memmap``.
+
+    Layout: magic, header length, JSON header (dtype, shape and offset of every
+    array, relative to the data section), then each array's raw little-endian
+    bytes at a 64-byte boundary.
+    """
+    entries = {}
+    blobs = []
+    offset = 0
+    for name, a in arrays.items():
+        a = np.ascontiguousarray(a)
+        a = a.astype(a.dtype.newbyteorder("<"), copy=False)
+        entries[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        blobs.append((offset, a))
+        offset = _aligned(offset + a.nbytes)
+    header_bytes = json.dumps({"arrays": entries, "meta": meta or {}}).encode()
+    data_start = _aligned(_PREFIX.size + len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for blob_offset, a in blobs:
+            f.seek(data_start + blob_offset)
+            f.write(a.tobytes())
+        f.truncate(data_start + offset)
+
+
+class MapBundle:
+    """Read-only, memory-mapped view of a bundle written by ``write_bundle``.
+
+    Every array is a zero-copy ``np.ndarray`` over the mapping; pages are only
+    read from disk when touched.
+    """
+
+    def __init__(self, path=BUNDLE_FILE):
+        self.path = path
+        self.mm = np.memmap(path, dtype=np.uint8, mode="r")
+        magic, header_len = _PREFIX.unpack(bytes(self.mm[:_PREFIX.size]))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a map bundle")
+        header = json.loads(bytes(self.mm[_PREFIX.size:_PREFIX.size + header_len]))
+        self.meta = header["meta"]
+        data_start = _aligned(_PREFIX.size + header_len)
+        self.arrays = {
+            name: np.ndarray(tuple(e["shape"]), dtype=np.dtype(e["dtype"]), buffer=self.mm,
+                             offset=data_start + e["offset"])
+            for name, e in header["arrays"].items()
+        }
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def road_graph(self):
+        return RoadGraph(*(self.arrays[name] for name in ROAD_ARRAYS))
+
+    def store(self):
+        return GeometryStore(*(self.arrays[name] for name in STORE_ARRAYS))
+
+
+def bundle_arrays(road_graph, store):
+    arrays = dict(zip(ROAD_ARRAYS, (road_graph.node_ids, road_graph.lonlat, road_graph.indptr,
+                                    road_graph.indices, road_graph.lengths)))
+    arrays.update(zip(STORE_ARRAYS, (store.coords, store.ring_offsets, store.feature_offsets,
+                                     store.layer_offsets, store.feature_rows)))
+    return arrays
@@ -1,31 +1,62 @@
 import pygame
 import random
 
+from hud import HUD_FONT_SIZE, BoilCycle, TextLabel, assets
+
+CANDY_BOIL_FRAMES = 4
+CANDY_BOIL_HOLD = 2
+
 
 class HandDrawnCandyDisplay:
-    def __init__(self, screen_width, screen_height, position=(50, 10)):
+    """The sketched "Candy: N" box in the top corner.
+
+    The box outline is a ``BoilCycle`` of a few pre-jittered frames and the
+    text is a ``TextLabel``, so a frame is two blits; the text is only
+    re-rendered when ``set_counter`` gets a new value.
+    """
+    name = "candy"
+    visible = True
+
+    def __init__(self, screen_width, screen_height, position=(50, 10), font_size=HUD_FONT_SIZE,
+                 boil_frames=CANDY_BOIL_FRAMES, boil_hold=CANDY_BOIL_HOLD, seed=0, margin=4):
         self.screen_width = screen_width
         self.screen_height = screen_height
         self.position = position
+        self.margin = margin
+        self.rng = random.Random(seed)
 
-        pygame.font.init()
-        self.font = pygame.font.SysFont("Arial", 24)
+        self.font = assets.font(font_size)
+        self.box_width = 150
+        self.box_height = 50
+        self.boil = BoilCycle(self._render_box, boil_frames, boil_hold)
+        self.label = TextLabel(self.font)
+        self.set_counter(0)
 
-    def draw(self, surface, counter):
-        box_width = 150
-        box_height = 50
+    def bounds(self):
+        """Screen rect the sketched box can touch, jitter included."""
+        return pygame.Rect(self.position, (self.box_width, self.box_height)).inflate(2 * self.margin,
+                                                                                     2 * self.margin)
+
+    def set_counter(self, counter):
+        self.label.set(f"Candy: {counter}")
+
+    def draw(self, surface):
+        surface.blit(self.boil.next(), self.bounds())
         box_x, box_y = self.position
+        text_rect = self.label.surface.get_rect(center=(box_x + self.box_width // 2, box_y + self.box_height // 2))
+        surface.blit(self.label.surface, text_rect)
+
+    def _render_box(self):
+        canvas = pygame.Surface(self.bounds().size, pygame.SRCALPHA)
+        box_x = box_y = self.margin
         box_coords = [
             (box_x, box_y),
-            (box_x + box_width, box_y),
-            (box_x + box_width, box_y + box_height),
-            (box_x, box_y + box_height)
+            (box_x + self.box_width, box_y),
+            (box_x + self.box_width, box_y + self.box_height),
+            (box_x, box_y + self.box_height)
         ]
-        self._draw_hand_drawn_polygon(surface, box_coords)
-        text = f"Candy: {counter}"
-        text_surface = self.font.render(text, True, (0, 0, 0))
-        text_rect = text_surface.get_rect(center=(box_x + box_width // 2, box_y + box_height // 2))
-        surface.blit(text_surface, text_rect)
+        self._draw_hand_drawn_polygon(canvas, box_coords)
+        return canvas
 
     def _draw_hand_drawn_polygon(self, surface, coords):
         for i in range(len(coords)):
@@ -35,8 +66,8 @@ class HandDrawnCandyDisplay:
 
     def _draw_sketch_line(self, surface, color, start_pos, end_pos, roughness=2, iterations=2):
         for _ in range(iterations):
-            sx = start_pos[0] + random.randint(-roughness, roughness)
-            sy = start_pos[1] + random.randint(-roughness, roughness)
-            ex = end_pos[0] + random.randint(-roughness, roughness)
-            ey = end_pos[1] + random.randint(-roughness, roughness)
+            sx = start_pos[0] + self.rng.randint(-roughness, roughness)
+            sy = start_pos[1] + self.rng.randint(-roughness, roughness)
+            ex = end_pos[0] + self.rng.randint(-roughness, roughness)
+            ey = end_pos[1] + self.rng.randint(-roughness, roughness)
             pygame.draw.aaline(surface, color, (sx, sy), (ex, ey))
@@ -0,0 +1,243 @@
+import math
+import pygame
+from static import *
+from tiles import pyramid_level
+from profiler import profiler
+
+
+class TileLayer:
+    def __init__(self, tile_cache):
+        self.tile_cache = tile_cache
+
+    def draw(self, target, rect, pan_x, pan_y, level=1.0):
+        self.tile_cache.draw_rect(target, rect, pan_x, pan_y, level)
+
+
+class SurfaceLayer:
+    """A big-map sized surface, blitted one screen rect at a time.
+
+    At pyramid levels other than 1 only the world area behind ``rect`` is
+    cropped and scaled, never the whole surface.
+    """
+
+    def __init__(self, surface):
+        self.surface = surface
+
+    def draw(self, target, rect, pan_x, pan_y, level=1.0):
+        if level == 1.0:
+            target.blit(self.surface, rect.topleft, area=rect.move(-pan_x, -pan_y))
+            return
+        left = math.floor((rect.left - pan_x) / level)
+        top = math.floor((rect.top - pan_y) / level)
+        right = math.ceil((rect.right - pan_x) / level)
+        bottom = math.ceil((rect.bottom - pan_y) / level)
+        area = pygame.Rect(left, top, right - left, bottom - top).clip(self.surface.get_rect())
+        if not area.width or not area.height:
+            return
+        size = (max(1, round(area.width * level)), max(1, round(area.height * level)))
+        crop = pygame.transform.smoothscale(self.surface.subsurface(area), size)
+        target.blit(crop, (round(area.x * level) + pan_x, round(area.y * level) + pan_y))
+
+
+class SpriteLayer:
+    """Small sprites placed on the big map.
+
+    ``source(world_rect)`` returns the ``(sprite, world_rect)`` pairs
+    overlapping a big-map rect. At pyramid levels other than 1 sprites are
+    scaled, and with ``static_sprites`` (sprites never redrawn in place, like
+    atlas sprites) the scaled copies are cached per level.
+    """
+
+    def __init__(self, source, static_sprites=True):
+        self.source = source
+        self.static_sprites = static_sprites
+        self.scaled = {}
+
+    def _scaled(self, sprite, level):
+        key = (sprite, level)
+        scaled = self.scaled.get(key) if self.static_sprites else None
+        if scaled is None:
+            w, h = sprite.get_size()
+            scaled = pygame.transform.smoothscale(sprite, (max(1, round(w * level)), max(1, round(h * level))))
+            if self.static_sprites:
+                self.scaled[key] = scaled
+        return scaled
+
+    def draw(self, target, rect, pan_x, pan_y, level=1.0):
+        left = math.floor((rect.left - pan_x) / level)
+        top = math.floor((rect.top - pan_y) / level)
+        world = pygame.Rect(left, top, math.ceil((rect.right - pan_x) / level) - left,
+                            math.ceil((rect.bottom - pan_y) / level) - top)
+        for sprite, sprite_rect in self.source(world):
+            if level != 1.0:
+                sprite = self._scaled(sprite, level)
+            target.blit(sprite, (round(sprite_rect.x * level) + pan_x, round(sprite_rect.y * level) + pan_y))
+
+
+def merge_rects(rects):
+    """Union overlapping rects until none overlap; fine for the few rects of a frame."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+def world_to_level(rect, level):
+    """Smallest level-space rect covering a world (big-map) rect."""
+    if level == 1.0:
+        return pygame.Rect(rect)
+    left = math.floor(rect.left * level)
+    top = math.floor(rect.top * level)
+    return pygame.Rect(left, top, math.ceil(rect.right * level) - left + 1,
+                       math.ceil(rect.bottom * level) - top + 1)
+
+
+class Compositor:
+    """Keeps a back buffer of the map layers and only redraws what changed.
+
+    The back buffer holds the visible part of the map at the pyramid level
+    nearest to the current zoom (see ``tiles.pyramid_level``); the residual
+    scale is applied to that viewport-sized crop only, so a frame costs about
+    the same at any zoom. At an exact level the buffer is the screen size
+    and no scaling happens at all.
+
+    When the camera pans, the back buffer is scrolled and only the exposed
+    strips are re-composited (the whole viewport is still pushed to the
+    display, since everything moved on screen). Layers report changes as
+    world (big-map) rects through ``invalidate_world``. HUD widgets are
+    drawn straight onto the screen every frame; the area they covered the
+    frame before is restored from the back buffer first. When the camera is
+    still, only touched rects are pushed to the display.
+    """
+
+    def __init__(self, screen, layers, background=WHITE):
+        self.screen = screen
+        self.layers = layers
+        self.background = background
+        self.viewport = screen.get_rect()
+        self.back = None
+        self.front = None
+        self.view = None
+        self.level = None
+        self.pan = None
+        self.dirty = []
+        self.hud_rects = []
+        self.pushed = 0
+
+    def resize(self, screen):
+        """Adopt a new (resized) display surface; the buffers are rebuilt on the next render."""
+        self.screen = screen
+        self.viewport = screen.get_rect()
+        self.back = None
+        self.hud_rects = []
+        self.pan = None
+
+    def invalidate_world(self, *rects):
+        self.dirty.extend(("world", pygame.Rect(r)) for r in rects if r is not None)
+
+    def invalidate_screen(self, *rects):
+        self.dirty.extend(("screen", pygame.Rect(r)) for r in rects if r is not None)
+
+    def invalidate_all(self):
+        self.pan = None
+
+    def _resize(self, zoom):
+        level, residual = pyramid_level(zoom)
+        w, h = self.viewport.size
+        size = (w, h) if residual == 1.0 else (max(1, round(w / residual)), max(1, round(h / residual)))
+        if self.back is None or self.back.get_size() != size:
+            self.back = pygame.Surface(size).convert(self.screen)
+            self.view = self.back.get_rect()
+            self.front = self.back if size == (w, h) else pygame.Surface((w, h)).convert(self.screen)
+            self.pan = None
+        if level != self.level:
+            self.level = level
+            self.pan = None
+
+    def _scroll(self, pan):
+        if self.pan is None:
+            return [self.view.copy()]
+        dx = pan[0] - self.pan[0]
+        dy = pan[1] - self.pan[1]
+        if dx == 0 and dy == 0:
+            return []
+        w, h = self.view.size
+        if abs(dx) >= w or abs(dy) >= h:
+            return [self.view.copy()]
+        self.back.scroll(dx, dy)
+        exposed = []
+        if dx > 0:
+            exposed.append(pygame.Rect(0, 0, dx, h))
+        elif dx < 0:
+            exposed.append(pygame.Rect(w + dx, 0, -dx, h))
+        if dy > 0:
+            exposed.append(pygame.Rect(0, 0, w, dy))
+        elif dy < 0:
+            exposed.append(pygame.Rect(0, h + dy, w, -dy))
+        return exposed
+
+    def _composite(self, rect, pan):
+        self.back.set_clip(rect)
+        self.back.fill(self.background, rect)
+        for layer in self.layers:
+            layer.draw(self.back, rect, pan[0], pan[1], self.level)
+        self.back.set_clip(None)
+
+    def render(self, pan_x, pan_y, zoom=1.0, hud=()):
+        """Composite dirty regions and present them.
+
+        ``pan_x``/``pan_y`` place the big map on screen at ``zoom``
+        (screen = world * zoom + pan). ``hud`` is a sequence of
+        ``(screen_rect, draw)`` pairs; ``draw(screen)`` is called for every
+        pair whose rect is not None.
+        """
+        self._resize(zoom)
+        scale_x = self.viewport.width / self.view.width
+        scale_y = self.viewport.height / self.view.height
+        pan = (int(round(pan_x / scale_x)), int(round(pan_y / scale_y)))
+        moved = self.pan != pan
+        rects = self._scroll(pan)
+        for space, rect in self.dirty:
+            if space == "world":
+                rects.append(world_to_level(rect, self.level).move(pan))
+            else:
+                rects.append(pygame.Rect(rect.x / scale_x, rect.y / scale_y,
+                                         rect.width / scale_x + 2, rect.height / scale_y + 2))
+        self.dirty = []
+        self.pan = pan
+
+        rects = [r.clip(self.view) for r in rects]
+        rects = merge_rects([r for r in rects if r.width and r.height])
+        with profiler.span("composite"):
+            for rect in rects:
+                self._composite(rect, pan)
+
+        hud = [(pygame.Rect(r).clip(self.viewport), draw) for r, draw in hud if r is not None]
+        if self.front is not self.back and (rects or moved):
+            with profiler.span("scale"):
+                pygame.transform.smoothscale(self.back, self.viewport.size, self.front)
+            rects = [self.viewport.copy()]
+        if moved:
+            # The whole view shifted on screen, even if little had to be re-composited.
+            present = [self.viewport.copy()]
+        else:
+            present = merge_rects(rects + self.hud_rects + [r for r, _ in hud])
+        with profiler.span("blit"):
+            for rect in present:
+                self.screen.blit(self.front, rect, area=rect)
+        for _, draw in hud:
+            draw(self.screen)
+        self.hud_rects = [r for r, _ in hud]
+
+        with profiler.span("display.update"):
+            pygame.display.update(present)
+        self.pushed = sum(r.width * r.height for r in present)
+        return present
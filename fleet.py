@@ -0,0 +1,156 @@
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+import pygame
+
+from static import *
+from simulation import SIM_HZ, RIDER_SPEED, random_routes
+from spatial import PackedGrid
+
+FLEET_CELL_SIZE = 128
+VEHICLE_RADIUS = 5
+VEHICLE_COLOR = (40, 90, 200)
+VEHICLE_OUTLINE = (20, 45, 100)
+
+
+class Fleet:
+    """Thousands of vehicles driving random routes, as struct-of-arrays state.
+
+    Vehicle ``k`` is ``distance[k]`` pixels along route ``route_ids[k]`` of a
+    ``simulation.RouteSet`` and moves at ``speed[k]`` px/s. ``step`` advances
+    every vehicle with a handful of array operations and one
+    ``RouteSet.positions_at``; vehicles that arrive pick a new route. ``xy``
+    and ``prev_xy`` are the positions after the last two ticks, and ``grid``
+    (rebuilt every tick) answers which vehicles are inside a rectangle.
+
+    It has the same ``step(dt)`` as ``simulation.Rider``, so a Simulation can
+    drive it.
+    """
+
+    def __init__(self, routes, n_vehicles, speed=RIDER_SPEED, speed_jitter=0.5, seed=0,
+                 cell_size=FLEET_CELL_SIZE):
+        self.routes = routes
+        self.rng = np.random.default_rng(seed)
+        self.route_ids = self.rng.integers(0, len(routes), n_vehicles)
+        self.distance = self.rng.uniform(0.0, 1.0, n_vehicles) * routes.lengths[self.route_ids]
+        self.speed = speed * self.rng.uniform(1.0 - speed_jitter, 1.0 + speed_jitter, n_vehicles)
+        self.xy = routes.positions_at(self.route_ids, self.distance)
+        self.prev_xy = self.xy.copy()
+        self.arrivals = 0
+        self.grid = PackedGrid(cell_size, BIG_MAP_WIDTH, BIG_MAP_HEIGHT)
+        self.grid.build(self.xy)
+        self.max_step = float(self.speed.max()) / SIM_HZ
+
+    def __len__(self):
+        return len(self.distance)
+
+    def step(self, dt):
+        self.prev_xy = self.xy
+        self.distance += self.speed * dt
+        self.max_step = float(self.speed.max()) * dt
+        done = np.flatnonzero(self.distance >= self.routes.lengths[self.route_ids])
+        if len(done):
+            self.arrivals += len(done)
+            self.route_ids[done] = self.rng.integers(0, len(self.routes), len(done))
+            self.distance[done] = 0.0
+        self.xy = self.routes.positions_at(self.route_ids, self.distance)
+        # A new route starts elsewhere; don't interpolate across the jump.
+        self.prev_xy[done] = self.xy[done]
+        self.grid.build(self.xy)
+
+    def visible(self, rect, margin=0):
+        """Indices of vehicles whose last two positions may fall within ``rect`` grown by ``margin``."""
+        grow = margin + self.max_step
+        return self.grid.query_rect(rect.left - grow, rect.top - grow, rect.right + grow, rect.bottom + grow)
+
+    def interpolated(self, alpha, ids=None):
+        if ids is None:
+            return self.prev_xy + (self.xy - self.prev_xy) * alpha
+        return self.prev_xy[ids] + (self.xy[ids] - self.prev_xy[ids]) * alpha
+
+
+def vehicle_sprite(radius=VEHICLE_RADIUS, color=VEHICLE_COLOR, outline=VEHICLE_OUTLINE, seed=0):
+    """The one sketchy dot every vehicle is drawn with."""
+    rng = random.Random(seed)
+    size = 2 * (radius + 2) + 1
+    sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+    c = size / 2
+    pygame.draw.circle(sprite, color, (c, c), radius - 1)
+    segments = 10
+    for _ in range(2):
+        points = []
+        for i in range(segments):
+            angle = 2 * math.pi * i / segments
+            r = radius + rng.uniform(-0.7, 0.7)
+            points.append((c + r * math.cos(angle), c + r * math.sin(angle)))
+        pygame.draw.aalines(sprite, outline, True, points)
+    return sprite
+
+
+class FleetLayer:
+    """Compositor layer that blits the shared vehicle sprite at every
+    vehicle inside the rect being composited (culled through ``Fleet.grid``)."""
+
+    def __init__(self, fleet, sprite=None):
+        self.fleet = fleet
+        self.sprite = sprite if sprite is not None else vehicle_sprite()
+        self.alpha = 0.0
+        self.scaled = {1.0: self.sprite}
+        self.drawn = 0
+
+    def draw(self, target, rect, pan_x, pan_y, level=1.0):
+        sprite = self.scaled.get(level)
+        if sprite is None:
+            w, h = self.sprite.get_size()
+            sprite = pygame.transform.smoothscale(self.sprite, (max(1, round(w * level)), max(1, round(h * level))))
+            self.scaled[level] = sprite
+        half_w, half_h = sprite.get_width() / 2, sprite.get_height() / 2
+        left = math.floor((rect.left - pan_x) / level)
+        top = math.floor((rect.top - pan_y) / level)
+        world = pygame.Rect(left, top, math.ceil((rect.right - pan_x) / level) - left,
+                            math.ceil((rect.bottom - pan_y) / level) - top)
+        ids = self.fleet.visible(world, margin=VEHICLE_RADIUS + 2)
+        if not len(ids):
+            return
+        xy = self.fleet.interpolated(self.alpha, ids) * level
+        xy[:, 0] += pan_x - half_w
+        xy[:, 1] += pan_y - half_h
+        target.blits([(sprite, pos) for pos in xy.round().astype(np.int64).tolist()], doreturn=False)
+        self.drawn += len(ids)
+
+
+def stress_test(n_vehicles=5000, seconds=600.0, seed=0, n_routes=500):
+    """Drive the fleet headless for ``seconds`` of simulated time and report tick cost."""
+    routes = random_routes(n_routes, seed)
+    fleet = Fleet(routes, n_vehicles, seed=seed)
+    dt = 1.0 / SIM_HZ
+    ticks = round(seconds / dt)
+    viewport = pygame.Rect(0, 0, WIDTH, HEIGHT)
+
+    start_t = time.perf_counter()
+    for _ in range(ticks):
+        fleet.step(dt)
+    step_t = time.perf_counter() - start_t
+
+    start_t = time.perf_counter()
+    seen = 0
+    for x, y in fleet.xy[:1000].tolist():
+        seen += len(fleet.visible(viewport.move(int(x) - WIDTH // 2, int(y) - HEIGHT // 2)))
+    query_t = time.perf_counter() - start_t
+
+    print(f"{n_vehicles} vehicles, {ticks} ticks: {step_t / ticks * 1000:.2f} ms/tick, "
+          f"{seconds / step_t:.0f}x real time, {fleet.arrivals} arrivals")
+    print(f"Viewport cull: {query_t / min(1000, n_vehicles) * 1e6:.0f} us/query, "
+          f"{seen / min(1000, n_vehicles):.0f} vehicles visible on average")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless fleet stress test.")
+    parser.add_argument("--vehicles", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    stress_test(args.vehicles, args.seconds, args.seed)
@@ -1,68 +1,136 @@
-from map_drawer import render_entire_map, create_path
+from map_drawer import create_path
+from tiles import TileCache
+from map_cache import CACHE_DIR, MapCache
+from compositor import Compositor, TileLayer, SurfaceLayer, SpriteLayer
 from menu import HandDrawnMenu
 from candy_display import HandDrawnCandyDisplay
+from hud import HUD
 from static import *
 from user import User
-from markers import Marker, generate_random_markers
+from simulation import Simulation, Rider, random_routes
+from fleet import Fleet, FleetLayer
+from picking import PickService
+from markers import Marker, MarkerField, generate_random_markers
+from routing import NoPath
+from profiler import profiler, ProfilerOverlay
+import argparse
+import random
 import time
-import math
 
-import networkx as nx
 import pygame
 
 
+ZOOM_STEPS = [2 ** (k / 4) for k in range(-8, 5)]
+FAST_FORWARD = 4.0
+SEEK_STEP = 500.0
+
+
 def open_marker_menu(marker):
     print(f"Opened menu for marker: {marker}")
 
 
-def main():
+def open_feature_info(pick):
+    print(f"Clicked {pick.kind} feature {pick.target} (row {pick.row})")
+
+
+def main(trace_path=None, seed=None, max_frames=None, fps=30, fleet_size=0, cache_dir=CACHE_DIR):
+    """Run the game. With ``trace_path`` every profiler span is recorded and
+    written there as a Chrome trace on exit; F3 toggles the timing overlay.
+
+    ``seed`` fixes the route and marker placement, ``max_frames`` stops the
+    loop after that many frames and ``fps=0`` runs unthrottled (both for
+    benchmark.py). The rider moves in fixed simulation ticks; unthrottled,
+    every frame is exactly one tick so runs are repeatable. ``fleet_size``
+    adds that many vehicles driving random routes around the user. Map
+    tiles are cached on disk under ``cache_dir``.
+    """
+    if seed is not None:
+        random.seed(seed)
+    profiler.trace = trace_path is not None
+    overlay = ProfilerOverlay(profiler)
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Pre-render + Zoom & Pan with Invalid Polygon Fix")
 
     zoom = 1.0
+    zoom_target = 1.0
     pan_x, pan_y = 0, 0
     pan_speed = 20
     user_circle = User()
-    surface_array = []
 
     menu = HandDrawnMenu(WIDTH, HEIGHT)
+    menu.prerender()
     candy_menu = HandDrawnCandyDisplay(WIDTH, HEIGHT)
+    hud = HUD([menu, candy_menu, overlay], profiler)
 
     # -------------------------------
     # MAP RENDER
     # -------------------------------
-    print("Rendering map. Please wait...")
+    print("Preparing map. Please wait...")
     counter = 0
     start_t = time.perf_counter()
-    big_map_surface = render_entire_map()
-    surface_array.append(big_map_surface)
+    tile_cache = TileCache(disk_cache=MapCache(cache_dir))
     path_surf = None
     path_positions = None
     while path_surf is None:
         try:
             path_surf, pan_x, pan_y, path_positions = create_path()
-            surface_array.append(path_surf)
-        except nx.NetworkXNoPath:
+        except NoPath:
             print("No path found. Retry")
     end_t = time.perf_counter()
-    print(f"Map rendered in {end_t - start_t:.2f} seconds.")
+    print(f"Map prepared in {end_t - start_t:.2f} seconds.")
 
     clock = pygame.time.Clock()
     running = True
-    surface_array.append(user_circle.surface)
-    markers = generate_random_markers()
-    surface_array.append(Marker.surface)
+    markers = generate_random_markers(seed=seed)
+    marker_field = MarkerField(markers, cell_size=user_circle.user_radius)
+    picker = PickService(marker_field).build()
     for marker in markers:
         marker.draw_marker()
-
+    Marker.take_dirty_rects()
+    user_sprite = SpriteLayer(lambda rect: [(user_circle.surface, user_circle.bounds())], static_sprites=False)
+    layers = [TileLayer(tile_cache), SurfaceLayer(path_surf), user_sprite, SpriteLayer(marker_field.sprites)]
+    sim = Simulation([Rider(path_positions)])
+    rider = sim.riders[0]
+    fleet_layer = None
+    if fleet_size:
+        fleet = Fleet(random_routes(200, seed or 0), fleet_size, seed=seed or 0)
+        sim.riders.append(fleet)
+        fleet_layer = FleetLayer(fleet)
+        layers.insert(2, fleet_layer)
+    compositor = Compositor(screen, layers)
+    user_circle.move_to(rider.x, rider.y)
+    last_t = time.perf_counter()
+
+    frames = 0
     while running:
+        frames += 1
+        if max_frames is not None and frames > max_frames:
+            break
+        frame_start = time.perf_counter()
+        with profiler.span("simulate"):
+            alpha = sim.advance(frame_start - last_t if fps else sim.dt)
+        last_t = frame_start
+        events_start = time.perf_counter()
         # print(pan_x, pan_y, zoom)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.VIDEORESIZE:
+                screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
+                compositor.resize(screen)
+                menu.resize(event.w, event.h)
+                menu.prerender()
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT:
+                if event.key == pygame.K_F3:
+                    overlay.visible = not overlay.visible
+                elif event.key == pygame.K_f:
+                    rider.rate = 1.0 if rider.rate != 1.0 else FAST_FORWARD
+                elif event.key == pygame.K_HOME:
+                    rider.seek(0.0)
+                elif event.key == pygame.K_PAGEDOWN:
+                    rider.seek(rider.distance + SEEK_STEP)
+                elif event.key == pygame.K_LEFT:
                     pan_x += pan_speed
                 elif event.key == pygame.K_RIGHT:
                     pan_x -= pan_speed
@@ -70,45 +138,67 @@ def main():
                     pan_y += pan_speed
                 elif event.key == pygame.K_DOWN:
                     pan_y -= pan_speed
+                elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    zoom_target = min(ZOOM_STEPS[-1], next((z for z in ZOOM_STEPS if z > zoom_target), zoom_target))
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    zoom_target = max(ZOOM_STEPS[0], next((z for z in reversed(ZOOM_STEPS) if z < zoom_target),
+                                                          zoom_target))
             elif menu.visible:
                 counter = menu.handle_event(event)
+                candy_menu.set_counter(counter)
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                mx, my = event.pos
-
-                for marker in Marker.active:
-                    marker_screen_x = (marker.marker_x - user_circle.circle_x) + WIDTH // 2
-                    marker_screen_y = (marker.marker_y - user_circle.circle_y) + HEIGHT // 2
-
-                    dist = math.hypot(mx - marker_screen_x, my - marker_screen_y)
-                    if dist < marker.radius and not marker.used:
-                        menu.box_clicked = False
-                        menu.show_candy = False
-                        menu.open()
-                        marker.make_used()
-                        break
-
-        scaled_w = int(BIG_MAP_WIDTH * zoom)
-        scaled_h = int(BIG_MAP_HEIGHT * zoom)
-
-        user_circle.draw_user(path_positions)
-        user_circle.draw_empty_circle(path_surf, 9)
-        for marker in markers:
-            marker.update_marker(user_circle.circle_x, user_circle.circle_y, user_circle.user_radius)
-
-        screen.fill(WHITE)
-        pan_x = -user_circle.circle_x + WIDTH // 2
-        pan_y = -user_circle.circle_y + HEIGHT // 2
-
-        for surface in surface_array:
-            surface_map = pygame.transform.smoothscale(surface, (scaled_w, scaled_h))
-            screen.blit(surface_map, (pan_x, pan_y))
-
-        menu.draw(screen)
-        candy_menu.draw(screen, counter)
-        pygame.display.flip()
-        clock.tick(30)
+                # Only markers within reach of the user (the highlighted ones) can be opened.
+                pick = picker.pick(event.pos, pan_x, pan_y, zoom, marker_filter=lambda m: m in marker_field.nearby)
+                if pick is None:
+                    continue
+                if pick.kind == "marker":
+                    menu.box_clicked = False
+                    menu.show_candy = False
+                    menu.open()
+                    pick.target.make_used()
+                else:
+                    open_feature_info(pick)
+        profiler.record("events", events_start, time.perf_counter())
+
+        compositor.invalidate_world(user_circle.bounds())
+        with profiler.span("draw_user"):
+            user_circle.move_to(*rider.interpolated(alpha))
+            user_circle.draw_user()
+            user_circle.draw_empty_circle(path_surf, 9)
+        with profiler.span("markers"):
+            marker_field.update(user_circle.circle_x, user_circle.circle_y, user_circle.user_radius)
+        compositor.invalidate_world(user_circle.bounds(), *Marker.take_dirty_rects())
+        if fleet_layer is not None:
+            # Vehicles move all over the screen every frame; tracking a rect
+            # per vehicle would cost more than recompositing the view.
+            fleet_layer.alpha = alpha
+            compositor.invalidate_all()
+
+        # Ease towards the requested zoom; landing exactly on a step keeps
+        # pyramid levels (ZOOM_LEVELS are steps too) free of residual scaling.
+        zoom += (zoom_target - zoom) * 0.25
+        if abs(zoom_target - zoom) < 1e-3:
+            zoom = zoom_target
+        pan_x = -user_circle.circle_x * zoom + screen.get_width() // 2
+        pan_y = -user_circle.circle_y * zoom + screen.get_height() // 2
+
+        with profiler.span("render"):
+            compositor.render(pan_x, pan_y, zoom, hud=hud.entries())
+        profiler.record("frame", frame_start, time.perf_counter())
+        clock.tick(fps)
     pygame.quit()
 
+    if trace_path is not None:
+        print(f"Wrote {profiler.dump_trace(trace_path)} trace events to {trace_path}")
+    print("\n".join(profiler.report()))
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Walk the map collecting candy.")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record profiler spans and write a Chrome trace JSON here on exit")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fleet", type=int, default=0, metavar="N",
+                        help="also simulate N vehicles driving random routes")
+    args = parser.parse_args()
+    main(args.trace, args.seed, fleet_size=args.fleet)
\ No newline at end of file
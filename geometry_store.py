@@ -0,0 +1,119 @@
+import numpy as np
+
+GREEN = 0
+BUILDINGS = 1
+LAYER_NAMES = ("green", "buildings")
+
+
+class GeometryStore:
+    """All polygon exterior rings of the map packed into flat arrays.
+
+    ``coords`` is an (N, 2) float64 array of lon/lat vertices, ring after ring.
+    Three offset arrays describe how it nests:
+
+    * ``ring_offsets``    (R + 1) -> vertices of each ring
+    * ``feature_offsets`` (F + 1) -> rings of each feature (a GeoDataFrame row;
+      a MultiPolygon row has several rings)
+    * ``layer_offsets``   (L + 1) -> features of each layer (green, buildings)
+
+    ``feature_rows`` keeps the GeoDataFrame row position of each feature.
+    Invalid polygons are repaired with ``buffer(0)`` when the store is built.
+    """
+
+    def __init__(self, coords, ring_offsets, feature_offsets, layer_offsets, feature_rows):
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.feature_offsets = feature_offsets
+        self.layer_offsets = layer_offsets
+        self.feature_rows = feature_rows
+
+    @classmethod
+    def from_geodataframes(cls, layers):
+        import shapely
+
+        coords = []
+        ring_sizes = []
+        feature_sizes = []
+        layer_sizes = []
+        feature_rows = []
+        for gdf in layers:
+            geoms = np.asarray(gdf.geometry.values, dtype=object)
+            present = ~shapely.is_missing(geoms)
+            invalid = present & ~shapely.is_valid(geoms)
+            geoms = geoms.copy()
+            geoms[invalid] = shapely.buffer(geoms[invalid], 0)
+
+            parts, part_feature = shapely.get_parts(geoms, return_index=True)
+            keep = (shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)
+            keep &= shapely.is_valid(parts)
+            parts, part_feature = parts[keep], part_feature[keep]
+
+            rings = shapely.get_exterior_ring(parts)
+            ring_coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+            coords.append(ring_coords)
+            ring_sizes.append(np.bincount(ring_index, minlength=len(rings)))
+
+            features, rings_per_feature = np.unique(part_feature, return_counts=True)
+            feature_sizes.append(rings_per_feature)
+            feature_rows.append(features.astype(np.int64))
+            layer_sizes.append(len(features))
+
+        return cls(
+            np.ascontiguousarray(np.concatenate(coords), dtype=np.float64),
+            _offsets(np.concatenate(ring_sizes)),
+            _offsets(np.concatenate(feature_sizes)),
+            _offsets(np.asarray(layer_sizes)),
+            np.concatenate(feature_rows),
+        )
+
+    @property
+    def n_rings(self):
+        return len(self.ring_offsets) - 1
+
+    @property
+    def n_features(self):
+        return len(self.feature_offsets) - 1
+
+    def ring_feature(self):
+        return np.repeat(np.arange(self.n_features), np.diff(self.feature_offsets))
+
+    def ring_layer(self):
+        feature_layer = np.repeat(np.arange(len(self.layer_offsets) - 1), np.diff(self.layer_offsets))
+        return feature_layer[self.ring_feature()]
+
+    def layer_ring_range(self, layer):
+        first_feature = self.layer_offsets[layer]
+        last_feature = self.layer_offsets[layer + 1]
+        return int(self.feature_offsets[first_feature]), int(self.feature_offsets[last_feature])
+
+    def bounds(self):
+        if len(self.coords) == 0:
+            return None
+        min_x, min_y = self.coords.min(axis=0)
+        max_x, max_y = self.coords.max(axis=0)
+        return min_x, min_y, max_x, max_y
+
+    def ring_bounds(self, coords=None):
+        """(R, 4) min_x, min_y, max_x, max_y of every ring, optionally of projected coords."""
+        if coords is None:
+            coords = self.coords
+        if self.n_rings == 0:
+            return np.empty((0, 4), dtype=coords.dtype)
+        starts = self.ring_offsets[:-1]
+        return np.column_stack([
+            np.minimum.reduceat(coords[:, 0], starts),
+            np.minimum.reduceat(coords[:, 1], starts),
+            np.maximum.reduceat(coords[:, 0], starts),
+            np.maximum.reduceat(coords[:, 1], starts),
+        ])
+
+    def ring(self, index, coords=None):
+        if coords is None:
+            coords = self.coords
+        return coords[self.ring_offsets[index]:self.ring_offsets[index + 1]]
+
+
+def _offsets(sizes):
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets
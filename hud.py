@@ -0,0 +1,107 @@
+import os
+import pygame
+
+from static import *
+
+HUD_FONT_NAME = "Arial"
+HUD_FONT_SIZE = 24
+
+
+class Assets:
+    """Fonts shared by every HUD widget, each loaded once.
+
+    ``font(size)`` is the HUD font: the bundled ``HUD_FONT_FILE`` when it
+    exists, otherwise the ``HUD_FONT_NAME`` system font (looked up once).
+    Pass ``system=`` for another system font. Fonts die with
+    ``pygame.quit()``, so the cache is emptied then and a later
+    ``pygame.init()`` loads them afresh.
+    """
+
+    def __init__(self, font_file=HUD_FONT_FILE):
+        self.font_file = font_file
+        self.fonts = {}
+        pygame.register_quit(self.fonts.clear)
+
+    def font(self, size, system=None):
+        if not pygame.font.get_init():
+            pygame.font.init()
+        key = (system, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if system is None and self.font_file and os.path.exists(self.font_file):
+                font = pygame.font.Font(self.font_file, size)
+            else:
+                font = pygame.font.SysFont(system or HUD_FONT_NAME, size)
+            self.fonts[key] = font
+        return font
+
+
+assets = Assets()
+
+
+class BoilCycle:
+    """A few pre-rendered, differently jittered frames replayed in a loop.
+
+    ``render()`` is called ``count`` times the first time a frame is needed;
+    after that ``next()`` just returns the frames in turn, each held for
+    ``hold`` calls, which reads as the hand-drawn "boil".
+    """
+
+    def __init__(self, render, count=4, hold=2):
+        self.render = render
+        self.count = count
+        self.hold = hold
+        self.frames = None
+        self.tick = 0
+
+    def prerender(self):
+        if self.frames is None:
+            self.frames = [self.render() for _ in range(self.count)]
+        return self
+
+    def next(self):
+        self.prerender()
+        frame = self.frames[(self.tick // self.hold) % len(self.frames)]
+        self.tick += 1
+        return frame
+
+
+class TextLabel:
+    """Rendered text that is only re-rendered when ``set`` gets a new string."""
+
+    def __init__(self, font, color=(0, 0, 0)):
+        self.font = font
+        self.color = color
+        self.text = None
+        self.surface = None
+        self.renders = 0
+
+    def set(self, text):
+        if text != self.text:
+            self.text = text
+            self.surface = self.font.render(text, True, self.color)
+            self.renders += 1
+        return self.surface
+
+
+class HUD:
+    """The widgets drawn over the map, in order, as compositor HUD entries.
+
+    A widget has ``name`` and ``visible`` attributes, ``bounds()`` (its
+    screen rect) and ``draw(surface)``; each draw is timed in a ``profiler``
+    span named after the widget.
+    """
+
+    def __init__(self, widgets, profiler):
+        self.widgets = list(widgets)
+        self.profiler = profiler
+
+    def entries(self):
+        return [(widget.bounds() if widget.visible else None, self._timed(widget))
+                for widget in self.widgets]
+
+    def _timed(self, widget):
+        def draw(surface):
+            with self.profiler.span(widget.name):
+                widget.draw(surface)
+        return draw
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import struct
+import zlib
+
+import pygame
+import static
+
+CACHE_DIR = ".map_cache"
+# Bump whenever the rendering code changes in a way that alters the pixels.
+RENDER_VERSION = 3
+
+_MAGIC = b"YTMP"
+_HEADER = struct.Struct("<4sHII")
+
+
+def data_fingerprint(data_files=None, extra=()):
+    """Content hash of the map inputs, the colour constants and render parameters.
+
+    The inputs are the preprocessed bundle when ``static.data`` reads from
+    one (the source files may not even be present then) and the
+    GraphML/GeoJSON files otherwise.
+    """
+    if data_files is None:
+        if static.data.bundle is not None:
+            data_files = (static.data.bundle_file,)
+        else:
+            data_files = (static.data.roads_file, static.data.buildings_file, static.data.green_file)
+    h = hashlib.sha256()
+    h.update(repr(RENDER_VERSION).encode())
+    for path in data_files:
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    style = (static.WHITE, static.ROAD_COLOR, static.GREEN_OUTLINE, static.GREEN_HATCH,
+             static.BUILDING_OUTLINE, static.BUILDING_HATCH,
+             static.BIG_MAP_WIDTH, static.BIG_MAP_HEIGHT)
+    h.update(repr(style).encode())
+    h.update(repr(tuple(extra)).encode())
+    return h.hexdigest()[:20]
+
+
+class MapCache:
+    """Directory of rendered map layers stored as zlib-compressed raw RGBA.
+
+    Entries live under ``<cache_dir>/<fingerprint>/`` so any change to the data
+    files or the style constants makes every old entry unreachable.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, fingerprint=None, level=1):
+        self.cache_dir = cache_dir
+        self._fingerprint = fingerprint
+        self.level = level
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = data_fingerprint()
+        return self._fingerprint
+
+    def path(self, name):
+        return os.path.join(self.cache_dir, self.fingerprint, name + ".ytmap")
+
+    def load_surface(self, name):
+        try:
+            with open(self.path(name), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        try:
+            magic, version, width, height = _HEADER.unpack_from(data)
+            if magic != _MAGIC or version != RENDER_VERSION:
+                self.misses += 1
+                return None
+            pixels = zlib.decompress(memoryview(data)[_HEADER.size:])
+        except (struct.error, zlib.error):
+            # Truncated or damaged entry: re-render it like any other miss.
+            self.misses += 1
+            return None
+        if len(pixels) != width * height * 4:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pygame.image.frombytes(pixels, (width, height), "RGBA")
+
+    def save_surface(self, name, surface):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        width, height = surface.get_size()
+        pixels = pygame.image.tobytes(surface, "RGBA")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, RENDER_VERSION, width, height))
+            f.write(zlib.compress(pixels, self.level))
+        os.replace(tmp_path, path)
@@ -1,51 +1,37 @@
-import math
+import os
 import random
 import time
 from static import *
-import networkx as nx
+from map_cache import MapCache
+from hatching import hatch_polygon, hatch_rings, draw_segments
+import geometry_store
+from routing import get_router
+import numpy as np
 
 import pygame
-from shapely.geometry import Polygon, MultiPolygon, LineString
 
 # -------------------------------------------------------------------
 # 1) GLOBALS & LOADING DATA
 # -------------------------------------------------------------------
-lons = []
-lats = []
+_bounds = None
 
-node_positions = {node: (data["x"], data["y"]) for node, data in graph.nodes(data=True)}
-for (lon, lat) in node_positions.values():
-    lons.append(lon)
-    lats.append(lat)
 
-
-def collect_polygon_coords(gdf):
-    for idx, row in gdf.iterrows():
-        geom = row["geometry"]
-        if geom is None:
-            continue
-        if isinstance(geom, Polygon):
-            for (lon, lat) in geom.exterior.coords:
-                lons.append(lon)
-                lats.append(lat)
-        elif isinstance(geom, MultiPolygon):
-            for poly in geom.geoms:
-                for (lon, lat) in poly.exterior.coords:
-                    lons.append(lon)
-                    lats.append(lat)
-
-
-collect_polygon_coords(buildings)
-collect_polygon_coords(green_areas)
-
-min_lon, max_lon = min(lons), max(lons)
-min_lat, max_lat = min(lats), max(lats)
+def get_bounds():
+    """(min_lon, min_lat, max_lon, max_lat) over road nodes and polygon vertices."""
+    global _bounds
+    if _bounds is None:
+        all_lonlat = np.concatenate([data.road_graph.lonlat, data.store.coords])
+        min_lon, min_lat = all_lonlat.min(axis=0)
+        max_lon, max_lat = all_lonlat.max(axis=0)
+        _bounds = (float(min_lon), float(min_lat), float(max_lon), float(max_lat))
+    return _bounds
 
 
 # -------------------------------------------------------------------
 # 2) BIG SURFACE & COORDINATE MAPPING
 # -------------------------------------------------------------------
 def lonlat_to_bigmap_xy(lon, lat):
+    min_lon, min_lat, max_lon, max_lat = get_bounds()
     frac_x = (lon - min_lon) / (max_lon - min_lon)
     frac_y = (lat - min_lat) / (max_lat - min_lat)
     x = int(frac_x * BIG_MAP_WIDTH)
@@ -53,6 +39,15 @@ def lonlat_to_bigmap_xy(lon, lat):
     return (x, y)
 
 
+def lonlat_to_bigmap_array(lonlat):
+    min_lon, min_lat, max_lon, max_lat = get_bounds()
+    lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+    xy = np.empty(lonlat.shape, dtype=np.int64)
+    xy[:, 0] = ((lonlat[:, 0] - min_lon) / (max_lon - min_lon) * BIG_MAP_WIDTH).astype(np.int64)
+    xy[:, 1] = ((1.0 - (lonlat[:, 1] - min_lat) / (max_lat - min_lat)) * BIG_MAP_HEIGHT).astype(np.int64)
+    return xy
+
+
 # -------------------------------------------------------------------
 # 3) FIXING INVALID POLYGONS
 # -------------------------------------------------------------------
@@ -67,175 +62,294 @@ def fix_polygon(geom):
 # -------------------------------------------------------------------
 # 4) HAND-DRAWN & CROSS-HATCH UTILS
 # -------------------------------------------------------------------
-def draw_sketch_line(surface, color, start, end, iterations=2, roughness=1):
-    for _ in range(random.randint(1, iterations)):
-        sx = start[0] + random.randint(-roughness, roughness)
-        sy = start[1] + random.randint(-roughness, roughness)
-        ex = end[0] + random.randint(-roughness, roughness)
-        ey = end[1] + random.randint(-roughness, roughness)
+def draw_sketch_line(surface, color, start, end, iterations=2, roughness=1, rng=random):
+    for _ in range(rng.randint(1, iterations)):
+        sx = start[0] + rng.randint(-roughness, roughness)
+        sy = start[1] + rng.randint(-roughness, roughness)
+        ex = end[0] + rng.randint(-roughness, roughness)
+        ey = end[1] + rng.randint(-roughness, roughness)
         pygame.draw.aaline(surface, color, (sx, sy), (ex, ey))
 
 
-def draw_hatch_lines(surface, poly, hatch_spacing, hatch_angle, color):
-    theta = math.radians(hatch_angle)
-    nx = -math.sin(theta)
-    ny = math.cos(theta)
-    min_x, min_y, max_x, max_y = poly.bounds
-    corners = [(min_x, min_y), (min_x, max_y), (max_x, min_y), (max_x, max_y)]
-    c_values = [nx * x + ny * y for (x, y) in corners]
-    c_min, c_max = min(c_values), max(c_values)
-
-    center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-    dx = math.cos(theta)
-    dy = math.sin(theta)
-    L = math.sqrt((max_x - min_x) ** 2 + (max_y - min_y) ** 2) * 1.5
-
-    c = c_min - hatch_spacing
-    while c < c_max + hatch_spacing:
-        center_proj = nx * center[0] + ny * center[1]
-        d = c - center_proj
-        p0 = (center[0] + d * nx, center[1] + d * ny)
-        p1 = (p0[0] - L * dx, p0[1] - L * dy)
-        p2 = (p0[0] + L * dx, p0[1] + L * dy)
-        line = LineString([p1, p2])
-        if poly.is_valid:
-            inter = poly.intersection(line)
-            if not inter.is_empty:
-                if inter.geom_type == "LineString":
-                    coords = list(inter.coords)
-                    if len(coords) >= 2:
-                        pygame.draw.aaline(
-                            surface, color,
-                            (int(coords[0][0]), int(coords[0][1])),
-                            (int(coords[-1][0]), int(coords[-1][1]))
-                        )
-                elif inter.geom_type == "MultiLineString":
-                    for seg in inter.geoms:
-                        coords = list(seg.coords)
-                        if len(coords) >= 2:
-                            pygame.draw.aaline(
-                                surface, color,
-                                (int(coords[0][0]), int(coords[0][1])),
-                                (int(coords[-1][0]), int(coords[-1][1]))
-                            )
-        c += hatch_spacing
-
-
-def draw_crosshatch(surface, poly, spacing=10, color=BUILDING_OUTLINE):
-    draw_hatch_lines(surface, poly, spacing, 45, color)
-    draw_hatch_lines(surface, poly, spacing, -45, color)
+def draw_hatch_lines(surface, coords, hatch_spacing, hatch_angle, color, offset=(0, 0)):
+    segments = hatch_polygon(coords, hatch_spacing, hatch_angle)
+    draw_segments(surface, color, segments, offset=offset, truncate=True)
+
+
+def draw_crosshatch(surface, coords, spacing=10, color=BUILDING_OUTLINE, offset=(0, 0)):
+    draw_hatch_lines(surface, coords, spacing, 45, color, offset)
+    draw_hatch_lines(surface, coords, spacing, -45, color, offset)
 
 
 def draw_sketch_crosshatch_polygon(surface, outline_color, screen_coords,
-                                   hatch_color=None, roughness=1, iterations=2):
+                                   hatch_color=None, roughness=1, iterations=2, rng=random,
+                                   offset=(0, 0)):
     if hatch_color is None:
         hatch_color = outline_color
-
-    raw_poly = Polygon(screen_coords)
-    raw_poly = fix_polygon(raw_poly)
-    if not raw_poly or not raw_poly.is_valid:
+    if len(screen_coords) < 3:
         return
 
-    draw_crosshatch(surface, raw_poly, spacing=10, color=hatch_color)
+    draw_crosshatch(surface, screen_coords, spacing=10, color=hatch_color, offset=offset)
 
+    ox, oy = offset
     for i in range(len(screen_coords)):
         start_pt = screen_coords[i]
         end_pt = screen_coords[(i + 1) % len(screen_coords)]
-        draw_sketch_line(surface, outline_color, start_pt, end_pt,
-                         iterations=iterations, roughness=roughness)
+        draw_sketch_line(surface, outline_color, (start_pt[0] - ox, start_pt[1] - oy),
+                         (end_pt[0] - ox, end_pt[1] - oy),
+                         iterations=iterations, roughness=roughness, rng=rng)
 
 
 # -------------------------------------------------------------------
-# 5) RENDER THE ENTIRE MAP (BIG SURFACE) ONCE
+# 5) FEATURE LIST & REGION RENDERING
 # -------------------------------------------------------------------
-def render_entire_map():
+FEATURE_MARGIN = 3
+RENDER_CHUNK_SIZE = 500
+# Road strokes: 1..ROAD_PASSES sketchy passes per polyline, each vertex
+# nudged by up to ROAD_ROUGHNESS pixels. Long chains are split so a region
+# never redraws much road outside itself.
+ROAD_PASSES = 10
+ROAD_ROUGHNESS = 1
+ROAD_MAX_VERTICES = 32
+
+LAYER_STYLES = {
+    geometry_store.GREEN: (GREEN_OUTLINE, GREEN_HATCH),
+    geometry_store.BUILDINGS: (BUILDING_OUTLINE, BUILDING_HATCH),
+}
+
+
+class MapFeatures:
+    """Big-map pixel view of the geometry store plus the roads.
+
+    Feature ids are the draw order: every ring of the store first (layer by
+    layer), then one id per road polyline. Road polylines are the undirected
+    street segments (a two-way street once, not twice) chained through
+    degree-2 nodes; ``road_segments`` still lists every directed edge.
+    """
+
+    def __init__(self):
+        store = data.store
+        road_graph = data.road_graph
+        self.ring_xy = lonlat_to_bigmap_array(store.coords)
+        self.ring_offsets = store.ring_offsets
+        self.ring_layer = store.ring_layer()
+        self.n_rings = store.n_rings
+
+        node_xy = lonlat_to_bigmap_array(road_graph.lonlat)
+        self.road_segments = np.hstack([node_xy[road_graph.edge_sources()], node_xy[road_graph.indices]])
+
+        vertices, self.road_offsets, self.road_counts = road_graph.polylines(ROAD_MAX_VERTICES)
+        self.road_xy = node_xy[vertices]
+        self.n_roads = len(self.road_offsets) - 1
+        starts = self.road_offsets[:-1]
+        road_bbox = np.column_stack([
+            np.minimum.reduceat(self.road_xy, starts),
+            np.maximum.reduceat(self.road_xy, starts),
+        ]) if self.n_roads else np.zeros((0, 4))
+        self.bbox = np.concatenate([store.ring_bounds(self.ring_xy), road_bbox])
+        self._road_jitter = {}
+
+    def query(self, min_x, min_y, max_x, max_y):
+        bbox = self.bbox
+        hit = ((bbox[:, 2] + FEATURE_MARGIN >= min_x) & (bbox[:, 0] - FEATURE_MARGIN <= max_x) &
+               (bbox[:, 3] + FEATURE_MARGIN >= min_y) & (bbox[:, 1] - FEATURE_MARGIN <= max_y))
+        return np.flatnonzero(hit)
+
+    def road_jitter(self, seed):
+        """Sketch jitter of every road stroke for ``seed``, drawn in one batch.
+
+        Returns ``(passes, offsets, jitter)``: road ``r`` is stroked
+        ``passes[r]`` times and ``jitter[offsets[r]:offsets[r + 1]]`` holds
+        the pixel offsets of its vertices, pass after pass. A road standing
+        for several directed edges gets 1..ROAD_PASSES passes for each of
+        them, as dark as when every edge was drawn on its own. It depends
+        only on the seed, so every region draws a road the same way.
+        """
+        cached = self._road_jitter.get(seed)
+        if cached is None:
+            rng = np.random.default_rng(seed)
+            draws = rng.integers(1, ROAD_PASSES + 1, (self.n_roads, int(self.road_counts.max(initial=1))))
+            passes = (draws * (np.arange(draws.shape[1]) < self.road_counts[:, None])).sum(axis=1)
+            offsets = np.zeros(self.n_roads + 1, dtype=np.int64)
+            np.cumsum(passes * np.diff(self.road_offsets), out=offsets[1:])
+            jitter = rng.integers(-ROAD_ROUGHNESS, ROAD_ROUGHNESS + 1, (offsets[-1], 2), dtype=np.int64)
+            cached = self._road_jitter[seed] = passes, offsets, jitter
+        return cached
+
+
+_features = None
+
+
+def load_features():
+    global _features
+    if _features is None:
+        _features = MapFeatures()
+    return _features
+
+
+def query_features(min_x, min_y, max_x, max_y):
+    """Return ids (in draw order) of features whose bbox overlaps a big-map rect."""
+    return load_features().query(min_x, min_y, max_x, max_y)
+
+
+def render_region(surface, origin_x, origin_y, zoom=1.0, seed=0):
+    """Draw the part of the map whose zoomed big-map pixel origin is (origin_x, origin_y).
+
+    Every feature gets its own RNG seeded from (seed, feature id) and is hatched
+    in zoomed map coordinates before being shifted into the region, so a feature
+    split across several regions is drawn identically in each of them. Rings of
+    one layer are hatched in a single batch, then outlined; roads take their
+    jitter from ``MapFeatures.road_jitter(seed)`` and are drawn last.
+    """
+    width, height = surface.get_size()
+    features = load_features()
+    fids = features.query(origin_x / zoom, origin_y / zoom,
+                          (origin_x + width) / zoom, (origin_y + height) / zoom)
+    offset = (origin_x, origin_y)
+
+    ring_ids = fids[fids < features.n_rings]
+    for layer, (outline_color, hatch_color) in LAYER_STYLES.items():
+        layer_rings = ring_ids[features.ring_layer[ring_ids] == layer]
+        if len(layer_rings) == 0:
+            continue
+        starts = features.ring_offsets[layer_rings]
+        sizes = features.ring_offsets[layer_rings + 1] - starts
+        vertex_index = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+        zoomed = (features.ring_xy[vertex_index] * zoom).astype(np.int64)
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+
+        for angle in (45, -45):
+            segments, _ = hatch_rings(zoomed, offsets, 10, angle)
+            draw_segments(surface, hatch_color, segments, offset=offset, truncate=True)
+
+        for i, fid in enumerate(layer_rings.tolist()):
+            rng = random.Random(seed * 1000003 + fid)
+            ring = (zoomed[offsets[i]:offsets[i + 1]] - offset).tolist()
+            for j in range(len(ring)):
+                draw_sketch_line(surface, outline_color, ring[j], ring[(j + 1) % len(ring)],
+                                 iterations=2, roughness=0, rng=rng)
+
+    draw_roads(surface, features, fids[fids >= features.n_rings] - features.n_rings, offset, zoom, seed)
+
+
+def draw_roads(surface, features, road_ids, offset=(0, 0), zoom=1.0, seed=0):
+    """Stroke road polylines with their pre-generated jitter.
+
+    The stroke points of all roads are built as one array and each stroke
+    is a single ``aalines`` call over a whole polyline.
+    """
+    if len(road_ids) == 0:
+        return
+    passes, jitter_offsets, jitter = features.road_jitter(seed)
+    starts = features.road_offsets[road_ids]
+    sizes = features.road_offsets[road_ids + 1] - starts
+    counts = passes[road_ids]
+    blocks = sizes * counts
+    block_start = np.cumsum(blocks) - blocks
+    local = np.arange(blocks.sum()) - np.repeat(block_start, blocks)
+    vertex = np.repeat(starts, blocks) + local % np.repeat(sizes, blocks)
+    points = ((features.road_xy[vertex] * zoom).astype(np.int64) - offset +
+              jitter[np.repeat(jitter_offsets[road_ids], blocks) + local])
+
+    points = points.tolist()
+    stroke_sizes = np.repeat(sizes, counts).tolist()
+    i = 0
+    for size in stroke_sizes:
+        pygame.draw.aalines(surface, ROAD_COLOR, False, points[i:i + size])
+        i += size
+
+
+# -------------------------------------------------------------------
+# 6) RENDER THE ENTIRE MAP (BIG SURFACE) ONCE
+# -------------------------------------------------------------------
+def render_entire_map(seed=0, workers=1, chunk_size=RENDER_CHUNK_SIZE):
+    if workers != 1:
+        return render_entire_map_parallel(seed, workers, chunk_size)
     big_map_surf = pygame.Surface((BIG_MAP_WIDTH, BIG_MAP_HEIGHT), pygame.SRCALPHA)
     big_map_surf.fill(WHITE)
+    render_region(big_map_surf, 0, 0, 1.0, seed)
+    return big_map_surf
 
-    # Green areas
-    for idx, row in green_areas.iterrows():
-        geom = row["geometry"]
-        if geom is None:
-            continue
-        geom = fix_polygon(geom)
-        if not geom.is_valid:
-            continue
-        if isinstance(geom, Polygon):
-            coords = list(geom.exterior.coords)
-            scr_coords = [lonlat_to_bigmap_xy(lon, lat) for (lon, lat) in coords]
-            draw_sketch_crosshatch_polygon(
-                big_map_surf, GREEN_OUTLINE, scr_coords, hatch_color=GREEN_HATCH, roughness=0
-            )
-        elif isinstance(geom, MultiPolygon):
-            for poly in geom.geoms:
-                poly = fix_polygon(poly)
-                if not poly.is_valid:
-                    continue
-                coords = list(poly.exterior.coords)
-                scr_coords = [lonlat_to_bigmap_xy(lon, lat) for (lon, lat) in coords]
-                draw_sketch_crosshatch_polygon(
-                    big_map_surf, GREEN_OUTLINE, scr_coords, hatch_color=GREEN_HATCH, roughness=0
-                )
-
-    # Buildings
-    for idx, row in buildings.iterrows():
-        geom = row["geometry"]
-        if geom is None:
-            continue
-        geom = fix_polygon(geom)
-        if not geom.is_valid:
-            continue
-        if isinstance(geom, Polygon):
-            coords = list(geom.exterior.coords)
-            scr_coords = [lonlat_to_bigmap_xy(lon, lat) for (lon, lat) in coords]
-            draw_sketch_crosshatch_polygon(
-                big_map_surf, BUILDING_OUTLINE, scr_coords, hatch_color=BUILDING_HATCH, roughness=0
-            )
-        elif isinstance(geom, MultiPolygon):
-            for poly in geom.geoms:
-                poly = fix_polygon(poly)
-                if not poly.is_valid:
-                    continue
-                coords = list(poly.exterior.coords)
-                scr_coords = [lonlat_to_bigmap_xy(lon, lat) for (lon, lat) in coords]
-                draw_sketch_crosshatch_polygon(
-                    big_map_surf, BUILDING_OUTLINE, scr_coords, hatch_color=BUILDING_HATCH, roughness=0
-                )
-
-    # Roads
-    for (u, v) in graph.edges():
-        lon1, lat1 = node_positions[u]
-        lon2, lat2 = node_positions[v]
-        start_pos = lonlat_to_bigmap_xy(lon1, lat1)
-        end_pos = lonlat_to_bigmap_xy(lon2, lat2)
-        draw_sketch_line(big_map_surf, ROAD_COLOR, start_pos, end_pos,
-                         iterations=10, roughness=1)
 
+def load_or_render_map(seed=0, cache=None, workers=1):
+    """The base map from ``cache``, rendered and stored on a miss.
+
+    Chunked (parallel) renders differ from serial ones at the chunk seams,
+    so the two are cached under different names; the worker count itself
+    does not change the pixels.
+    """
+    if cache is None:
+        cache = MapCache()
+    mode = "serial" if workers == 1 else f"chunks{RENDER_CHUNK_SIZE}"
+    name = f"base_{BIG_MAP_WIDTH}x{BIG_MAP_HEIGHT}_s{seed}_{mode}"
+    big_map_surf = cache.load_surface(name)
+    if big_map_surf is None:
+        big_map_surf = render_entire_map(seed, workers)
+        cache.save_surface(name, big_map_surf)
+    return big_map_surf
+
+
+# -------------------------------------------------------------------
+# 7) PARALLEL RENDER
+# -------------------------------------------------------------------
+def map_chunks(chunk_size=RENDER_CHUNK_SIZE):
+    return [(x, y, min(chunk_size, BIG_MAP_WIDTH - x), min(chunk_size, BIG_MAP_HEIGHT - y))
+            for y in range(0, BIG_MAP_HEIGHT, chunk_size)
+            for x in range(0, BIG_MAP_WIDTH, chunk_size)]
+
+
+def _init_render_worker():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    load_features()
+
+
+def _render_chunk(job):
+    x, y, w, h, seed = job
+    chunk = pygame.Surface((w, h), pygame.SRCALPHA)
+    chunk.fill(WHITE)
+    render_region(chunk, x, y, 1.0, seed)
+    return x, y, w, h, pygame.image.tobytes(chunk, "RGBA")
+
+
+def render_entire_map_parallel(seed=0, workers=None, chunk_size=RENDER_CHUNK_SIZE):
+    """Render the big map as fixed-size chunks in a process pool.
+
+    The chunk grid does not depend on ``workers`` and every feature's jitter
+    depends only on the seed, so the result is the same for any worker count.
+    Features are projected before the pool starts so forked workers inherit them.
+    """
+    load_features()
+    big_map_surf = pygame.Surface((BIG_MAP_WIDTH, BIG_MAP_HEIGHT), pygame.SRCALPHA)
+    big_map_surf.fill(WHITE)
+    jobs = [(x, y, w, h, seed) for (x, y, w, h) in map_chunks(chunk_size)]
+
+    with pool_context().Pool(workers, initializer=_init_render_worker) as pool:
+        for x, y, w, h, pixels in pool.imap_unordered(_render_chunk, jobs):
+            big_map_surf.blit(pygame.image.frombytes(pixels, (w, h), "RGBA"), (x, y))
     return big_map_surf
 
 
 def create_path():
+    road_graph = data.road_graph
+    router = get_router()
+    node_xy = lonlat_to_bigmap_array(road_graph.lonlat)
+
     def draw_path(_screen, _path_nodes, color=(255, 0, 0, 80), thickness=4):
         for i in range(len(_path_nodes) - 1):
-            u = _path_nodes[i]
-            v = _path_nodes[i + 1]
-            lon_u, lat_u = node_positions[u]
-            lon_v, lat_v = node_positions[v]
-            start_pos = lonlat_to_bigmap_xy(lon_u, lat_u)
-            end_pos = lonlat_to_bigmap_xy(lon_v, lat_v)
+            start_pos = node_xy[_path_nodes[i]].tolist()
+            end_pos = node_xy[_path_nodes[i + 1]].tolist()
             pygame.draw.line(_screen, color, start_pos, end_pos, thickness)
 
-    path_surf = pygame.Surface((BIG_MAP_WIDTH, BIG_MAP_HEIGHT), pygame.SRCALPHA)
-    path_surf.fill((0, 0, 0, 0))
-
-    start_node, end_node = random.sample(list(graph.nodes), 2)
-    print(f"Random start_node = {start_node}, end_node = {end_node}")
+    start_node, end_node = random.sample(range(road_graph.n_nodes), 2)
+    print(f"Random start_node = {road_graph.node_ids[start_node]}, end_node = {road_graph.node_ids[end_node]}")
 
-    path_nodes = nx.shortest_path(graph, start_node, end_node, weight="length")
+    path_nodes = router.route(start_node, end_node)
     print(f"Path length (nodes): {len(path_nodes)}")
 
+    path_surf = pygame.Surface((BIG_MAP_WIDTH, BIG_MAP_HEIGHT), pygame.SRCALPHA)
+    path_surf.fill((0, 0, 0, 0))
     draw_path(path_surf, path_nodes, color=(255, 214, 51, 80), thickness=8)
-    start_node_lon, start_node_lat = node_positions[start_node]
-    pan_x, pan_y = lonlat_to_bigmap_xy(start_node_lon, start_node_lat)
-    path_cords = [lonlat_to_bigmap_xy(*node_positions[node]) for node in path_nodes]
+    pan_x, pan_y = node_xy[start_node].tolist()
+    path_cords = [tuple(xy) for xy in node_xy[path_nodes].tolist()]
     return path_surf, -pan_x + WIDTH // 2, -pan_y + HEIGHT // 2, path_cords
@@ -1,16 +1,83 @@
 import math
 import random
 import pygame
-from shapely.geometry import Polygon, LineString
+from hatching import hatch_polygon, draw_segments
+from spatial import UniformGrid, poisson_disk_darts, poisson_disk_sample, poisson_disk_subset
 from static import *
 
 
+MARKER_OUTLINE = (102, 82, 0)
+USED_COLOR = (128, 128, 128, 255)
+SPRITE_MARGIN = 5
+MARKER_DART_ATTEMPTS = 10000
+
+
+def build_marker_shape(center_x, center_y, radius=20, tip_height=30, segments=12):
+    shape_points = []
+    for i in range(segments + 1):
+        angle = math.pi + (i * (math.pi / segments))
+        x = center_x + radius * math.cos(angle)
+        y = center_y + radius * math.sin(angle)
+        shape_points.append((x, y))
+
+    bottom_tip = (center_x, center_y + tip_height)
+    shape_points.append(bottom_tip)
+    return shape_points
+
+
+def draw_sketch_outline(surface, dot_array, color=(0, 0, 0), roughness=1, iterations=2, rng=random):
+    for i in range(len(dot_array)):
+        start = dot_array[i]
+        end = dot_array[(i + 1) % len(dot_array)]
+        for _ in range(iterations):
+            sx = start[0] + rng.randint(-roughness, roughness)
+            sy = start[1] + rng.randint(-roughness, roughness)
+            ex = end[0] + rng.randint(-roughness, roughness)
+            ey = end[1] + rng.randint(-roughness, roughness)
+            pygame.draw.aaline(surface, color, (sx, sy), (ex, ey))
+
+
+class MarkerAtlas:
+    """Pre-rendered marker sprites shared by every Marker.
+
+    Each (radius, tip height, colour) variant is hatched and outlined once
+    into ``jitter_count`` slightly different sprites, so markers keep their
+    hand-drawn wobble while drawing one costs a single blit.
+    """
+
+    def __init__(self, jitter_count=4, seed=0):
+        self.jitter_count = jitter_count
+        self.rng = random.Random(seed)
+        self.variants = {}
+
+    @staticmethod
+    def anchor(radius):
+        return radius + SPRITE_MARGIN, radius + SPRITE_MARGIN
+
+    def sprites(self, radius, tip_height, color):
+        key = (radius, tip_height, tuple(color))
+        sprites = self.variants.get(key)
+        if sprites is None:
+            sprites = [self._render(radius, tip_height, color) for _ in range(self.jitter_count)]
+            self.variants[key] = sprites
+        return sprites
+
+    def _render(self, radius, tip_height, color):
+        ax, ay = self.anchor(radius)
+        sprite = pygame.Surface((2 * ax, ay + tip_height + SPRITE_MARGIN), pygame.SRCALPHA)
+        dot_array = build_marker_shape(ax, ay, radius=radius, tip_height=tip_height, segments=12)
+        for angle in (45, -45):
+            draw_segments(sprite, color, hatch_polygon(dot_array, 6, angle), width=2)
+        draw_sketch_outline(sprite, dot_array, color=MARKER_OUTLINE, roughness=2, iterations=2, rng=self.rng)
+        return sprite
+
+
 class Marker:
+    """A map marker drawn as one atlas sprite; ``sprite_rect`` is where it sits on the big map."""
     marker_x, marker_y = 0, 0
-    surface = None
-    polygon = None
-    dot_array = []
+    atlas = None
     active = []
+    dirty_rects = []
     used = False
     radius = 30
 
@@ -19,144 +86,136 @@ class Marker:
         self.name = name
         self.marker_x = marker_x
         self.marker_y = marker_y
-        if Marker.surface is None:
-            Marker.surface = pygame.Surface((BIG_MAP_WIDTH, BIG_MAP_HEIGHT), pygame.SRCALPHA)
-        self.surface.fill((0, 0, 0, 0))
+        self.sprite = None
+        self.sprite_rect = None
+        if Marker.atlas is None:
+            Marker.atlas = MarkerAtlas()
 
     def make_used(self):
-        min_x, min_y, max_x, max_y = self.polygon.bounds
-        self.color = (128, 128, 128, 255)
-        pygame.draw.rect(self.surface, (0, 0, 0, 0),
-                         (min_x - 5, min_y - 5, max_x - min_x + 10, max_y - min_y + 10))
-        self.draw_marker(refresh=True)
+        self.color = USED_COLOR
+        self.clear_marker()
+        self.draw_marker()
         if self in Marker.active:
             Marker.active.remove(self)
         self.used = True
 
-    def draw_hatch_lines(self, hatch_spacing, hatch_angle, color):
-        import math
-        theta = math.radians(hatch_angle)
-        nx = -math.sin(theta)
-        ny = math.cos(theta)
-        min_x, min_y, max_x, max_y = self.polygon.bounds
-        corners = [(min_x, min_y), (min_x, max_y), (max_x, min_y), (max_x, max_y)]
-        c_values = [nx * x + ny * y for (x, y) in corners]
-        c_min, c_max = min(c_values), max(c_values)
-
-        center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-        dx = math.cos(theta)
-        dy = math.sin(theta)
-        L = math.sqrt((max_x - min_x) ** 2 + (max_y - min_y) ** 2) * 1.5
-
-        c = c_min - hatch_spacing
-        while c < c_max + hatch_spacing:
-            center_proj = nx * center[0] + ny * center[1]
-            d = c - center_proj
-            p0 = (center[0] + d * nx, center[1] + d * ny)
-            p1 = (p0[0] - L * dx, p0[1] - L * dy)
-            p2 = (p0[0] + L * dx, p0[1] + L * dy)
-            line = LineString([p1, p2])
-            if self.polygon.is_valid:
-                inter = self.polygon.intersection(line)
-                if not inter.is_empty:
-                    if inter.geom_type == "LineString":
-                        coords = list(inter.coords)
-                        if len(coords) >= 2:
-                            pygame.draw.line(Marker.surface, color,
-                                             (coords[0][0], coords[0][1]),
-                                             (coords[-1][0], coords[-1][1]), width=2)
-                    elif inter.geom_type == "MultiLineString":
-                        for seg in inter.geoms:
-                            coords = list(seg.coords)
-                            if len(coords) >= 2:
-                                pygame.draw.line(Marker.surface, color,
-                                                 (coords[0][0], coords[0][1]),
-                                                 (coords[-1][0], coords[-1][1]), width=2)
-            c += hatch_spacing
-
-    def crosshatch_polygon(self, color=(100, 100, 100), spacing=8):
-        self.draw_hatch_lines(spacing, 45, color)
-        self.draw_hatch_lines(spacing, -45, color)
-
-    def draw_sketch_outline(self, color=(0, 0, 0),
-                            roughness=1, iterations=2):
-        for i in range(len(self.dot_array)):
-            start = self.dot_array[i]
-            end = self.dot_array[(i + 1) % len(self.dot_array)]
-            for _ in range(iterations):
-                sx = start[0] + random.randint(-roughness, roughness)
-                sy = start[1] + random.randint(-roughness, roughness)
-                ex = end[0] + random.randint(-roughness, roughness)
-                ey = end[1] + random.randint(-roughness, roughness)
-                pygame.draw.aaline(Marker.surface, color, (sx, sy), (ex, ey))
-
-    def build_marker_shape(self, radius=20, tip_height=30, segments=12):
-        shape_points = []
-        for i in range(segments + 1):
-            angle = math.pi + (i * (math.pi / segments))
-            x = self.marker_x + radius * math.cos(angle)
-            y = self.marker_y + radius * math.sin(angle)
-            shape_points.append((x, y))
-
-        bottom_tip = (self.marker_x, self.marker_y + tip_height)
-        shape_points.append(bottom_tip)
-        return shape_points
-
-    def draw_marker(self, radius=20, tip_height=30, refresh=False):
-        # pygame.draw.circle(Marker.surface, (255, 204, 0), (self.marker_x, self.marker_y), 5)
-        if self.polygon is None or refresh:
-            self.dot_array = self.build_marker_shape(radius=radius,
-                                                     tip_height=tip_height,
-                                                     segments=12)
-            self.polygon = Polygon(self.dot_array)
-        self.crosshatch_polygon(color=self.color, spacing=6)
-        self.draw_sketch_outline(color=(102, 82, 0), roughness=2, iterations=2)
+    def draw_marker(self, radius=20, tip_height=30):
+        self.sprite = random.choice(Marker.atlas.sprites(radius, tip_height, self.color))
+        ax, ay = MarkerAtlas.anchor(radius)
+        self.sprite_rect = self.sprite.get_rect(topleft=(self.marker_x - ax, self.marker_y - ay))
+        Marker.dirty_rects.append(self.sprite_rect)
+
+    def clear_marker(self):
+        if self.sprite_rect is not None:
+            Marker.dirty_rects.append(self.sprite_rect)
+        self.sprite = None
+        self.sprite_rect = None
+
+    @staticmethod
+    def take_dirty_rects():
+        """Big-map rects redrawn since the last call, for the compositor."""
+        rects = Marker.dirty_rects
+        Marker.dirty_rects = []
+        return rects
+
+    def highlight(self):
+        self.clear_marker()
+        self.draw_marker(radius=22, tip_height=33)
+        if self not in Marker.active:
+            Marker.active.append(self)
+
+    def unhighlight(self):
+        if self in Marker.active:
+            self.clear_marker()
+            self.draw_marker()
+            Marker.active.remove(self)
 
     def update_marker(self, user_x, user_y, user_radius):
         dx = user_x - self.marker_x
         dy = user_y - self.marker_y
         dist = math.hypot(dx, dy)
         if dist < user_radius * 1.25 and not self.used:
-            min_x, min_y, max_x, max_y = self.polygon.bounds
-            pygame.draw.rect(self.surface, (0, 0, 0, 0),
-                             (min_x - 5, min_y - 5, max_x - min_x + 10, max_y - min_y + 10))
-            self.draw_marker(radius=22, tip_height=33, refresh=True)
-            if self not in Marker.active:
-                Marker.active.append(self)
+            self.highlight()
         else:
-            if self in Marker.active:
-                min_x, min_y, max_x, max_y = self.polygon.bounds
-                pygame.draw.rect(self.surface, (0, 0, 0, 0),
-                                 (min_x - 5, min_y - 5, max_x - min_x + 10, max_y - min_y + 10))
-                self.draw_marker(refresh=True)
-                Marker.active.remove(self)
-
-
-def generate_random_markers(num_markers=400, min_dist=100):
-    markers = []
-    attempts = 0
-    max_attempts = 10000
-
-    while len(markers) < num_markers and attempts < max_attempts:
-        x = random.randint(0, BIG_MAP_WIDTH)
-        y = random.randint(0, BIG_MAP_HEIGHT)
-
-        too_close = False
-        for m in markers:
-            dx = x - m.marker_x
-            dy = y - m.marker_y
-            dist = math.hypot(dx, dy)
-            if dist < min_dist:
-                too_close = True
-                break
-
-        if not too_close:
-            markers.append(Marker(x, y, color=(187, 150, 0)))
-
-        attempts += 1
-
+            self.unhighlight()
+
+
+class MarkerField:
+    """Markers in a uniform grid so each frame only touches those near the user.
+
+    ``update`` queries the grid around the user, highlights every unused
+    marker in range and resets the ones that left the range since the last
+    call (a set difference), instead of testing every marker.
+    """
+
+    def __init__(self, markers, cell_size=100):
+        self.markers = list(markers)
+        self.grid = UniformGrid(cell_size)
+        for marker in self.markers:
+            self.grid.insert(marker, marker.marker_x, marker.marker_y)
+        self.nearby = set()
+
+    def update(self, user_x, user_y, user_radius):
+        near = {m for m in self.grid.query_radius(user_x, user_y, user_radius * 1.25) if not m.used}
+        for marker in self.nearby - near:
+            marker.unhighlight()
+        for marker in near:
+            marker.highlight()
+        self.nearby = near
+        return near
+
+    def sprites(self, rect, reach=SPRITE_MARGIN + 40):
+        """(sprite, big-map rect) of every drawn marker overlapping ``rect``.
+
+        ``reach`` is how far a sprite extends from its marker point, so the
+        grid query only has to widen the rect by that much.
+        """
+        found = []
+        for marker in self.grid.query_rect(rect.left - reach, rect.top - reach,
+                                           rect.right + reach, rect.bottom + reach):
+            if marker.sprite is not None and marker.sprite_rect.colliderect(rect):
+                found.append((marker.sprite, marker.sprite_rect))
+        return found
+
+
+def road_marker_candidates(step):
+    """Big-map pixel points on every road edge, ``step`` pixels apart."""
+    from map_drawer import load_features
+
+    segments = load_features().road_segments.astype(float)
+    candidates = []
+    for x1, y1, x2, y2 in segments.tolist():
+        n = max(1, int(math.hypot(x2 - x1, y2 - y1) // step))
+        for i in range(n + 1):
+            t = i / n
+            candidates.append((x1 + (x2 - x1) * t, y1 + (y2 - y1) * t))
+    return candidates
+
+
+def generate_random_markers(num_markers=400, min_dist=100, seed=None, snap_to_roads=False):
+    """Place up to ``num_markers`` markers at least ``min_dist`` apart.
+
+    Points are uniform random darts checked against a Poisson-disk grid,
+    stopping as soon as ``num_markers`` fit; if the darts run out first, the
+    gaps are filled by Bridson growth from the points already placed, again
+    only up to ``num_markers``. Either way the work follows ``num_markers``,
+    not the map area. With ``snap_to_roads`` points are picked from along
+    the road edges instead, so no marker lands inside a building. The same
+    ``seed`` always gives the same placement.
+    """
+    rng = random.Random(seed)
+    if snap_to_roads:
+        points = poisson_disk_subset(road_marker_candidates(min_dist / 4), BIG_MAP_WIDTH, BIG_MAP_HEIGHT,
+                                     min_dist, rng, limit=num_markers)
+    else:
+        points = poisson_disk_darts(BIG_MAP_WIDTH, BIG_MAP_HEIGHT, min_dist, rng, num_markers,
+                                    max_attempts=max(MARKER_DART_ATTEMPTS, 20 * num_markers))
+        if len(points) < num_markers:
+            points = poisson_disk_sample(BIG_MAP_WIDTH, BIG_MAP_HEIGHT, min_dist, rng,
+                                         limit=num_markers, seeds=points)
+
+    markers = [Marker(int(x), int(y), color=(187, 150, 0)) for (x, y) in points]
     if len(markers) < num_markers:
         print(f"Warning: Only placed {len(markers)} markers "
-              f"before hitting {max_attempts} attempts.")
-
+              f"with min_dist={min_dist} on a {BIG_MAP_WIDTH}x{BIG_MAP_HEIGHT} map.")
     return markers
@@ -1,18 +1,34 @@
 import random
 import pygame
 import math
-from shapely.geometry import Polygon, LineString
+from hatching import hatch_polygon, draw_segments
+from hud import HUD_FONT_SIZE, BoilCycle, assets
+
+
+MENU_BOIL_FRAMES = 4
+MENU_BOIL_HOLD = 2
 
 
 class HandDrawnMenu:
-    polygon = None
+    """Bottom-sheet menu with a big marker, a close cross and a candy box.
+
+    The panel never changes between frames except for its hand-drawn
+    jitter, so each state (box or candy) gets a ``BoilCycle`` of
+    ``boil_frames`` differently jittered frames, each held for
+    ``boil_hold`` draws. Drawing the open menu is one blit. ``resize``
+    re-lays the menu out and drops the frames.
+    """
+    name = "menu"
     dot_array = None
 
-    def __init__(self, screen_width, screen_height, corner_radius=40):
+    def __init__(self, screen_width, screen_height, corner_radius=40,
+                 boil_frames=MENU_BOIL_FRAMES, boil_hold=MENU_BOIL_HOLD, seed=0):
         self.counter = 0
-        self.screen_width = screen_width
-        self.screen_height = screen_height
         self.corner_radius = corner_radius
+        self.boil_frames = boil_frames
+        self.boil_hold = boil_hold
+        self.rng = random.Random(seed)
+        self.frames = {}
 
         self.visible = False
         self.text = "Hello from the bottom half!"
@@ -22,23 +38,27 @@ class HandDrawnMenu:
         self.marker_color = (255, 0, 0)
         self.cross_color = (255, 0, 0)
 
-        self.x = 0
-        self.y = self.screen_height // 2
-        self.w = self.screen_width
-        self.h = self.screen_height // 2
-
-        pygame.font.init()
-        self.font = pygame.font.SysFont("Arial", 24)
+        self.font = assets.font(HUD_FONT_SIZE)
 
         self.cross_offset = 40
         self.cross_size = 15
 
         self.box_width = 200
         self.box_height = 100
-        self.box_x = (self.screen_width - self.box_width) // 2
-        self.box_y = self.y + 50
         self.box_clicked = False
         self.show_candy = False
+        self.resize(screen_width, screen_height)
+
+    def resize(self, screen_width, screen_height):
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.x = 0
+        self.y = self.screen_height // 2
+        self.w = self.screen_width
+        self.h = self.screen_height // 2
+        self.box_x = (self.screen_width - self.box_width) // 2
+        self.box_y = self.y + 50
+        self.frames = {}
 
     def open(self, text="Hello from the bottom half!"):
         self.visible = True
@@ -47,12 +67,34 @@ class HandDrawnMenu:
     def close(self):
         self.visible = False
 
+    def bounds(self, radius=60, tip_height=90, margin=4):
+        """Screen rect covering the panel and the big marker sticking out above it."""
+        top = min(self.y, self.screen_height // 2 - tip_height // 2 - radius) - margin
+        return pygame.Rect(0, top, self.screen_width, self.screen_height - top)
+
     def draw(self, surface):
         if not self.visible:
             return
+        surface.blit(self._boil(self.show_candy).next(), self.bounds())
+
+    def prerender(self):
+        """Render every state now, so the first open costs nothing."""
+        for show_candy in (False, True):
+            self._boil(show_candy).prerender()
+
+    def _boil(self, show_candy):
+        boil = self.frames.get(show_candy)
+        if boil is None:
+            boil = BoilCycle(lambda: self._render_frame(show_candy), self.boil_frames, self.boil_hold)
+            self.frames[show_candy] = boil
+        return boil
+
+    def _render_frame(self, show_candy):
+        bounds = self.bounds()
+        canvas = pygame.Surface((self.screen_width, self.screen_height), pygame.SRCALPHA)
 
         shape_points = self._build_rounded_top_polygon(self.x, self.y, self.w, self.h, self.corner_radius)
-        pygame.draw.polygon(surface, self.fill_color, shape_points)
+        pygame.draw.polygon(canvas, self.fill_color, shape_points)
 
         outline_passes = 2
         roughness = 2
@@ -60,25 +102,26 @@ class HandDrawnMenu:
             for i in range(len(shape_points)):
                 p1 = shape_points[i]
                 p2 = shape_points[(i + 1) % len(shape_points)]
-                sx1 = p1[0] + random.randint(-roughness, roughness)
-                sy1 = p1[1] + random.randint(-roughness, roughness)
-                sx2 = p2[0] + random.randint(-roughness, roughness)
-                sy2 = p2[1] + random.randint(-roughness, roughness)
-                pygame.draw.aaline(surface, self.outline_color, (sx1, sy1), (sx2, sy2))
+                sx1 = p1[0] + self.rng.randint(-roughness, roughness)
+                sy1 = p1[1] + self.rng.randint(-roughness, roughness)
+                sx2 = p2[0] + self.rng.randint(-roughness, roughness)
+                sy2 = p2[1] + self.rng.randint(-roughness, roughness)
+                pygame.draw.aaline(canvas, self.outline_color, (sx1, sy1), (sx2, sy2))
 
         # text_surf = self.font.render(self.text, True, self.text_color)
         # text_rect = text_surf.get_rect(
         #     center=(self.screen_width // 2, self.y + self.h // 2)
         # )
-        # surface.blit(text_surf, text_rect)
+        # canvas.blit(text_surf, text_rect)
 
-        self._draw_marker(surface)
-        self._draw_red_cross(surface)
+        self._draw_marker(canvas)
+        self._draw_red_cross(canvas)
 
-        if self.show_candy:
-            self._draw_hand_drawn_candy(surface)
+        if show_candy:
+            self._draw_hand_drawn_candy(canvas)
         else:
-            self._draw_hand_drawn_box(surface)
+            self._draw_hand_drawn_box(canvas)
+        return canvas.subsurface(bounds.clip(canvas.get_rect())).copy()
 
     def _build_rounded_top_polygon(self, x, y, w, h, r, segments=8):
         points = []
@@ -114,57 +157,21 @@ class HandDrawnMenu:
         passes = 2
         jitter = 2
         for _ in range(passes):
-            x1 = cx - arm_len + random.randint(-jitter, jitter)
-            y1 = cy - arm_len + random.randint(-jitter, jitter)
-            x2 = cx + arm_len + random.randint(-jitter, jitter)
-            y2 = cy + arm_len + random.randint(-jitter, jitter)
+            x1 = cx - arm_len + self.rng.randint(-jitter, jitter)
+            y1 = cy - arm_len + self.rng.randint(-jitter, jitter)
+            x2 = cx + arm_len + self.rng.randint(-jitter, jitter)
+            y2 = cy + arm_len + self.rng.randint(-jitter, jitter)
             pygame.draw.aaline(surface, self.cross_color, (x1, y1), (x2, y2))
 
-            x3 = cx - arm_len + random.randint(-jitter, jitter)
-            y3 = cy + arm_len + random.randint(-jitter, jitter)
-            x4 = cx + arm_len + random.randint(-jitter, jitter)
-            y4 = cy - arm_len + random.randint(-jitter, jitter)
+            x3 = cx - arm_len + self.rng.randint(-jitter, jitter)
+            y3 = cy + arm_len + self.rng.randint(-jitter, jitter)
+            x4 = cx + arm_len + self.rng.randint(-jitter, jitter)
+            y4 = cy - arm_len + self.rng.randint(-jitter, jitter)
             pygame.draw.aaline(surface, self.cross_color, (x3, y3), (x4, y4))
 
     def draw_hatch_lines(self, surface, hatch_spacing, hatch_angle, color):
-        theta = math.radians(hatch_angle)
-        nx = -math.sin(theta)
-        ny = math.cos(theta)
-        min_x, min_y, max_x, max_y = self.polygon.bounds
-        corners = [(min_x, min_y), (min_x, max_y), (max_x, min_y), (max_x, max_y)]
-        c_values = [nx * x + ny * y for (x, y) in corners]
-        c_min, c_max = min(c_values), max(c_values)
-
-        center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-        dx = math.cos(theta)
-        dy = math.sin(theta)
-        L = math.sqrt((max_x - min_x) ** 2 + (max_y - min_y) ** 2) * 1.5
-
-        c = c_min - hatch_spacing
-        while c < c_max + hatch_spacing:
-            center_proj = nx * center[0] + ny * center[1]
-            d = c - center_proj
-            p0 = (center[0] + d * nx, center[1] + d * ny)
-            p1 = (p0[0] - L * dx, p0[1] - L * dy)
-            p2 = (p0[0] + L * dx, p0[1] + L * dy)
-            line = LineString([p1, p2])
-            if self.polygon.is_valid:
-                inter = self.polygon.intersection(line)
-                if not inter.is_empty:
-                    if inter.geom_type == "LineString":
-                        coords = list(inter.coords)
-                        if len(coords) >= 2:
-                            pygame.draw.line(surface, color,
-                                             (coords[0][0], coords[0][1]),
-                                             (coords[-1][0], coords[-1][1]), width=2)
-                    elif inter.geom_type == "MultiLineString":
-                        for seg in inter.geoms:
-                            coords = list(seg.coords)
-                            if len(coords) >= 2:
-                                pygame.draw.line(surface, color,
-                                                 (coords[0][0], coords[0][1]),
-                                                 (coords[-1][0], coords[-1][1]), width=2)
-            c += hatch_spacing
+        segments = hatch_polygon(self.dot_array, hatch_spacing, hatch_angle)
+        draw_segments(surface, color, segments, width=2)
 
     def crosshatch_polygon(self, surface, color=(100, 100, 100), spacing=8):
         self.draw_hatch_lines(surface, spacing, 45, color)
@@ -176,10 +183,10 @@ class HandDrawnMenu:
             start = self.dot_array[i]
             end = self.dot_array[(i + 1) % len(self.dot_array)]
             for _ in range(iterations):
-                sx = start[0] + random.randint(-roughness, roughness)
-                sy = start[1] + random.randint(-roughness, roughness)
-                ex = end[0] + random.randint(-roughness, roughness)
-                ey = end[1] + random.randint(-roughness, roughness)
+                sx = start[0] + self.rng.randint(-roughness, roughness)
+                sy = start[1] + self.rng.randint(-roughness, roughness)
+                ex = end[0] + self.rng.randint(-roughness, roughness)
+                ey = end[1] + self.rng.randint(-roughness, roughness)
                 pygame.draw.aaline(surface, color, (sx, sy), (ex, ey))
 
     def build_marker_shape(self, radius=20, tip_height=30, segments=12):
@@ -194,12 +201,10 @@ class HandDrawnMenu:
         shape_points.append(bottom_tip)
         return shape_points
 
-    def _draw_marker(self, surface, radius=60, tip_height=90, refresh=True):
-        if self.polygon is None or refresh:
-            self.dot_array = self.build_marker_shape(radius=radius,
-                                                     tip_height=tip_height,
-                                                     segments=12)
-            self.polygon = Polygon(self.dot_array)
+    def _draw_marker(self, surface, radius=60, tip_height=90):
+        self.dot_array = self.build_marker_shape(radius=radius,
+                                                 tip_height=tip_height,
+                                                 segments=12)
         self.crosshatch_polygon(surface, color=(187, 150, 0), spacing=6)
         self.draw_sketch_outline(surface, color=(102, 82, 0), roughness=2, iterations=2)
 
@@ -246,10 +251,10 @@ class HandDrawnMenu:
 
     def _draw_sketch_line(self, surface, color, start_pos, end_pos, roughness=2, iterations=2):
         for _ in range(iterations):
-            sx = start_pos[0] + random.randint(-roughness, roughness)
-            sy = start_pos[1] + random.randint(-roughness, roughness)
-            ex = end_pos[0] + random.randint(-roughness, roughness)
-            ey = end_pos[1] + random.randint(-roughness, roughness)
+            sx = start_pos[0] + self.rng.randint(-roughness, roughness)
+            sy = start_pos[1] + self.rng.randint(-roughness, roughness)
+            ex = end_pos[0] + self.rng.randint(-roughness, roughness)
+            ey = end_pos[1] + self.rng.randint(-roughness, roughness)
             pygame.draw.aaline(surface, color, (sx, sy), (ex, ey))
 
     def handle_event(self, event):
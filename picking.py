@@ -0,0 +1,109 @@
+import numpy as np
+
+import geometry_store
+from markers import Marker
+from static import *
+
+
+class Pick:
+    """What a click landed on.
+
+    ``kind`` is "marker" (``target`` is the Marker) or a layer name from
+    ``geometry_store.LAYER_NAMES`` (``target`` is the store feature index and
+    ``row`` its GeoDataFrame row). ``x``/``y`` is the clicked big-map point.
+    """
+
+    def __init__(self, kind, target, x, y, row=None):
+        self.kind = kind
+        self.target = target
+        self.x = x
+        self.y = y
+        self.row = row
+
+    def __repr__(self):
+        return f"Pick({self.kind!r}, {self.target!r}, x={self.x:.0f}, y={self.y:.0f})"
+
+
+class PickService:
+    """Maps screen clicks to the topmost marker or map polygon under them.
+
+    Markers are found through the MarkerField's uniform grid (within
+    ``Marker.radius`` of the click). Polygons go through a shapely STRtree of
+    every ring in big-map pixels, with the geometries prepared so the
+    point-in-polygon tests on the few candidates are cheap; among several
+    hits the one drawn last (highest ring id) wins, and markers are drawn
+    above all polygons.
+    """
+
+    def __init__(self, marker_field=None, features=None):
+        self.marker_field = marker_field
+        self.features = features
+        self._tree = None
+
+    @staticmethod
+    def screen_to_world(sx, sy, pan_x, pan_y, zoom=1.0):
+        """Inverse of the compositor's screen = world * zoom + pan."""
+        return (sx - pan_x) / zoom, (sy - pan_y) / zoom
+
+    def build(self):
+        """Build the polygon index now instead of on the first click."""
+        import shapely
+        from map_drawer import load_features
+
+        if self.features is None:
+            self.features = load_features()
+        features = self.features
+        store = data.store
+        sizes = np.diff(features.ring_offsets)
+        rings = shapely.linearrings(features.ring_xy.astype(np.float64),
+                                    indices=np.repeat(np.arange(features.n_rings), sizes))
+        self.polygons = shapely.polygons(rings)
+        shapely.prepare(self.polygons)
+        self.ring_feature = store.ring_feature()
+        self.ring_layer = features.ring_layer
+        self.feature_rows = store.feature_rows
+        self._point = shapely.points
+        self._tree = shapely.STRtree(self.polygons)
+        return self
+
+    def pick_marker(self, x, y, marker_filter=None):
+        if self.marker_field is None:
+            return None
+        best = None
+        best_d2 = None
+        for marker in self.marker_field.grid.query_radius(x, y, Marker.radius):
+            if marker_filter is not None and not marker_filter(marker):
+                continue
+            d2 = (marker.marker_x - x) ** 2 + (marker.marker_y - y) ** 2
+            if best is None or d2 < best_d2:
+                best, best_d2 = marker, d2
+        return best
+
+    def pick_polygon(self, x, y):
+        """Ring id of the topmost polygon containing the big-map point, or None."""
+        if self._tree is None:
+            self.build()
+        hits = self._tree.query(self._point(x, y), predicate="intersects")
+        if len(hits) == 0:
+            return None
+        return int(hits.max())
+
+    def pick_world(self, x, y, marker_filter=None):
+        marker = self.pick_marker(x, y, marker_filter)
+        if marker is not None:
+            return Pick("marker", marker, x, y)
+        ring = self.pick_polygon(x, y)
+        if ring is None:
+            return None
+        feature = int(self.ring_feature[ring])
+        kind = geometry_store.LAYER_NAMES[self.ring_layer[ring]]
+        return Pick(kind, feature, x, y, row=int(self.feature_rows[feature]))
+
+    def pick(self, screen_pos, pan_x, pan_y, zoom=1.0, marker_filter=None):
+        """Topmost Pick under a screen position, or None.
+
+        ``marker_filter(marker)`` can rule markers out (e.g. ones out of
+        reach), letting the click fall through to the map below.
+        """
+        x, y = self.screen_to_world(screen_pos[0], screen_pos[1], pan_x, pan_y, zoom)
+        return self.pick_world(x, y, marker_filter)
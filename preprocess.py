@@ -0,0 +1,74 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from static import *
+from bundle import write_bundle, bundle_arrays
+
+# Run in a fresh interpreter per loader so import cost and peak RSS are not shared.
+_CHILD = """
+import os, resource, sys, time
+start_t = time.perf_counter()
+from static import MapData
+d = MapData(bundle_file=sys.argv[2]) if sys.argv[1] == "bundle" else MapData(bundle_file="")
+road_graph, store = d.road_graph, d.store
+_ = float(road_graph.lengths.sum()) + float(store.coords.sum())
+elapsed = time.perf_counter() - start_t
+if os.path.exists("/proc/self/status"):
+    # ru_maxrss is inherited across fork+exec on Linux; VmHWM is per address space.
+    with open("/proc/self/status") as f:
+        rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM"))
+else:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, rss)
+"""
+
+
+def build_bundle(out_path=BUNDLE_FILE):
+    source = MapData(bundle_file="")
+    start_t = time.perf_counter()
+    road_graph = source.road_graph
+    store = source.store
+    meta = {
+        "sources": [os.path.basename(p) for p in (ROADS_FILE, BUILDINGS_FILE, GREEN_FILE)],
+        "nodes": int(road_graph.n_nodes),
+        "edges": int(road_graph.n_edges),
+        "rings": int(store.n_rings),
+    }
+    write_bundle(out_path, bundle_arrays(road_graph, store), meta)
+    print(f"Wrote {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB, {meta['nodes']} nodes, "
+          f"{meta['edges']} edges, {meta['rings']} rings) in {time.perf_counter() - start_t:.2f} s")
+
+
+def benchmark(bundle_path=BUNDLE_FILE, repeats=3):
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")])))
+    print(f"{'loader':28s} {'load s (best)':>14s} {'peak RSS MB':>12s}")
+    for mode, label in (("source", "load_graphml + read_file"), ("bundle", "memory-mapped bundle")):
+        runs = []
+        for _ in range(repeats):
+            out = subprocess.run([sys.executable, "-c", _CHILD, mode, bundle_path],
+                                 capture_output=True, text=True, check=True, env=env)
+            elapsed, rss = out.stdout.split()[-2:]
+            runs.append((float(elapsed), int(rss)))
+        best = min(runs)
+        print(f"{label:28s} {best[0]:14.3f} {best[1] / 1e6:12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the download_moscow.py outputs into a compact memory-mappable bundle.")
+    parser.add_argument("--out", default=BUNDLE_FILE)
+    parser.add_argument("--benchmark", action="store_true",
+                        help="compare load time and RSS of the bundle against the source files")
+    args = parser.parse_args()
+
+    build_bundle(args.out)
+    if args.benchmark:
+        benchmark(args.out)
+
+
+if __name__ == "__main__":
+    main()
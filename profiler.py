@@ -0,0 +1,117 @@
+import collections
+import contextlib
+import json
+import os
+import time
+import pygame
+
+from hud import TextLabel, assets
+
+PROFILE_WINDOW = 300
+TRACE_EVENTS = 200000
+OVERLAY_COLOR = (0, 0, 0)
+OVERLAY_BACKGROUND = (255, 255, 255, 210)
+
+
+class Profiler:
+    """Named timing spans with rolling percentiles and an optional Chrome trace.
+
+    ``span(name)`` times a block; the last ``window`` durations of every name
+    are kept for p50/p95/p99. With ``trace`` on, every span is also recorded
+    as a complete ("X") event, and ``dump_trace`` writes them in the Chrome
+    trace format (open in chrome://tracing or ui.perfetto.dev). Spans nest,
+    so a "frame" span around the others shows spikes and what caused them.
+    """
+
+    def __init__(self, window=PROFILE_WINDOW, trace=False, max_events=TRACE_EVENTS):
+        self.window = window
+        self.trace = trace
+        self.enabled = True
+        self.samples = {}
+        self.events = collections.deque(maxlen=max_events)
+        self.origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        start_t = time.perf_counter()
+        try:
+            yield
+        finally:
+            end_t = time.perf_counter()
+            self.record(name, start_t, end_t)
+
+    def record(self, name, start_t, end_t):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = collections.deque(maxlen=self.window)
+        samples.append(end_t - start_t)
+        if self.trace:
+            self.events.append((name, start_t, end_t))
+
+    def percentiles(self, name, qs=(0.5, 0.95, 0.99)):
+        ordered = sorted(self.samples.get(name, ()))
+        if not ordered:
+            return tuple(0.0 for _ in qs)
+        return tuple(ordered[int(q * (len(ordered) - 1) + 0.5)] for q in qs)
+
+    def report(self):
+        """Lines of "name p50 p95 p99" in milliseconds, slowest p99 first."""
+        rows = [(name, *self.percentiles(name)) for name in self.samples]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        width = max((len(row[0]) for row in rows), default=4)
+        lines = [f"{'span':<{width}}   p50   p95   p99 ms"]
+        for name, p50, p95, p99 in rows:
+            lines.append(f"{name:<{width}} {p50 * 1000:5.1f} {p95 * 1000:5.1f} {p99 * 1000:5.1f}")
+        return lines
+
+    def dump_trace(self, path):
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "pid": pid, "tid": 0,
+                   "ts": (start_t - self.origin) * 1e6, "dur": (end_t - start_t) * 1e6}
+                  for name, start_t, end_t in self.events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+class ProfilerOverlay:
+    """Draws ``profiler.report()`` in a corner of the screen; toggled with ``visible``.
+
+    Each report line keeps its rendered surface and is only re-rendered
+    when its text changes.
+    """
+    name = "overlay"
+
+    def __init__(self, profiler, position=(5, 70), font_size=13):
+        self.profiler = profiler
+        self.position = position
+        self.font_size = font_size
+        self.visible = False
+        self.font = None
+        self.lines = []
+        self.labels = []
+
+    def bounds(self):
+        if not self.visible:
+            return None
+        if self.font is None:
+            self.font = assets.font(self.font_size, system="monospace")
+        self.lines = self.profiler.report()
+        width = max(self.font.size(line)[0] for line in self.lines)
+        return pygame.Rect(self.position, (width + 6, self.font.get_linesize() * len(self.lines) + 6))
+
+    def draw(self, surface):
+        rect = self.bounds()
+        panel = pygame.Surface(rect.size, pygame.SRCALPHA)
+        panel.fill(OVERLAY_BACKGROUND)
+        while len(self.labels) < len(self.lines):
+            self.labels.append(TextLabel(self.font, OVERLAY_COLOR))
+        for i, (label, line) in enumerate(zip(self.labels, self.lines)):
+            panel.blit(label.set(line), (3, 3 + i * self.font.get_linesize()))
+        surface.blit(panel, rect)
+
+
+profiler = Profiler()
@@ -0,0 +1,72 @@
+import argparse
+import os
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+from map_drawer import load_features, render_entire_map, load_or_render_map
+from map_cache import MapCache
+from tiles import TileCache, ZOOM_LEVELS
+
+
+def pixel_difference(a, b):
+    pa = np.frombuffer(pygame.image.tobytes(a, "RGBA"), dtype=np.uint32)
+    pb = np.frombuffer(pygame.image.tobytes(b, "RGBA"), dtype=np.uint32)
+    return int(np.count_nonzero(pa != pb))
+
+
+def speedup_report(workers, seed=0):
+    start_t = time.perf_counter()
+    load_features()
+    print(f"Features projected in {time.perf_counter() - start_t:.2f} seconds.")
+
+    start_t = time.perf_counter()
+    serial = render_entire_map(seed)
+    serial_t = time.perf_counter() - start_t
+    print(f"Serial render:              {serial_t:.2f} s")
+
+    start_t = time.perf_counter()
+    parallel = render_entire_map(seed, workers=workers)
+    parallel_t = time.perf_counter() - start_t
+    print(f"Parallel render ({workers} workers): {parallel_t:.2f} s")
+    print(f"Speedup: {serial_t / parallel_t:.2f}x")
+
+    again = render_entire_map(seed, workers=max(2, workers // 2))
+    print(f"Deterministic across worker counts: {pixel_difference(parallel, again) == 0}")
+    print(f"Pixels differing from serial (anti-aliasing at chunk seams): "
+          f"{pixel_difference(serial, parallel)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the base map ahead of time.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="render processes (1 renders serially)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", action="store_true",
+                        help="time the serial and parallel paths instead of filling the cache")
+    parser.add_argument("--pyramid", action="store_true",
+                        help="also fill the tile cache for every zoom level")
+    args = parser.parse_args()
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.report:
+        speedup_report(args.workers, args.seed)
+        return
+
+    if args.pyramid:
+        tile_cache = TileCache(seed=args.seed, disk_cache=MapCache())
+        for level in ZOOM_LEVELS:
+            start_t = time.perf_counter()
+            rendered = tile_cache.prerender(level)
+            print(f"Zoom {level}: {rendered} tiles rendered in {time.perf_counter() - start_t:.2f} seconds.")
+
+    start_t = time.perf_counter()
+    load_or_render_map(args.seed, MapCache(), workers=args.workers)
+    print(f"Base map ready in {time.perf_counter() - start_t:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
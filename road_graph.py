@@ -0,0 +1,142 @@
+import numpy as np
+
+
+class RoadGraph:
+    """Directed road graph in CSR form.
+
+    Node ``i`` has OSM id ``node_ids[i]`` and position ``lonlat[i]``; its
+    outgoing edges are ``indices[indptr[i]:indptr[i + 1]]`` with lengths (in
+    metres) ``lengths[indptr[i]:indptr[i + 1]]``. Parallel edges are kept, so
+    the edge list matches ``graph.edges()`` of the source MultiDiGraph.
+    """
+
+    def __init__(self, node_ids, lonlat, indptr, indices, lengths):
+        self.node_ids = node_ids
+        self.lonlat = lonlat
+        self.indptr = indptr
+        self.indices = indices
+        self.lengths = lengths
+        self._index_of = None
+
+    @classmethod
+    def from_networkx(cls, graph):
+        node_ids = list(graph.nodes)
+        index_of = {node: i for i, node in enumerate(node_ids)}
+        lonlat = np.array([(d["x"], d["y"]) for _, d in graph.nodes(data=True)], dtype=np.float64)
+
+        src, dst, lengths = [], [], []
+        for u, v, d in graph.edges(data=True):
+            src.append(index_of[u])
+            dst.append(index_of[v])
+            lengths.append(float(d.get("length", 0.0)))
+        src = np.asarray(src, dtype=np.int64)
+        order = np.argsort(src, kind="stable")
+
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(node_ids)), out=indptr[1:])
+        road_graph = cls(
+            np.asarray(node_ids, dtype=np.int64),
+            lonlat.reshape(-1, 2),
+            indptr,
+            np.asarray(dst, dtype=np.int32)[order],
+            np.asarray(lengths, dtype=np.float64)[order],
+        )
+        road_graph._index_of = index_of
+        return road_graph
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+    def edge_sources(self):
+        return np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr))
+
+    def index_of(self, node_id):
+        if self._index_of is None:
+            self._index_of = {int(node): i for i, node in enumerate(self.node_ids)}
+        return self._index_of[node_id]
+
+    def neighbors(self, i):
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.lengths[lo:hi]
+
+    def undirected_edges(self):
+        """(E, 2) node index pairs ``u < v``, one per street segment, and how
+        many directed edges each pair stands for.
+
+        Two-way streets are two directed edges (and parallel edges repeat
+        them); both collapse to one pair here. Self-loops are dropped.
+        """
+        pairs = np.column_stack([self.edge_sources(), self.indices]).astype(np.int64)
+        pairs.sort(axis=1)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        return np.unique(pairs, axis=0, return_counts=True)
+
+    def polylines(self, max_vertices=None):
+        """Undirected edges chained into polylines through degree-2 nodes.
+
+        Returns ``(vertices, offsets, counts)``: polyline ``p`` visits nodes
+        ``vertices[offsets[p]:offsets[p + 1]]`` and each of its edges stands
+        for ``counts[p]`` directed edges. Every undirected edge is in exactly
+        one polyline. Polylines break at junctions, dead ends and where the
+        count changes (a one-way stretch of a two-way street), and after
+        ``max_vertices`` vertices if given.
+        """
+        pairs, pair_counts = self.undirected_edges()
+        pair_counts = pair_counts.tolist()
+        n_pairs = len(pairs)
+        ends = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        order = np.argsort(ends, kind="stable")
+        ptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=self.n_nodes), out=ptr[1:])
+        degree = np.diff(ptr).tolist()
+        nbr = np.concatenate([pairs[:, 1], pairs[:, 0]])[order].tolist()
+        edge = np.tile(np.arange(n_pairs), 2)[order].tolist()
+        ptr = ptr.tolist()
+        used = [False] * n_pairs
+
+        def is_end(node):
+            if degree[node] != 2:
+                return True
+            return pair_counts[edge[ptr[node]]] != pair_counts[edge[ptr[node] + 1]]
+
+        def walk(start, k):
+            path = [start]
+            while True:
+                e = edge[k]
+                used[e] = True
+                node = nbr[k]
+                path.append(node)
+                if is_end(node):
+                    return path
+                k = ptr[node] if edge[ptr[node]] != e else ptr[node] + 1
+                if used[edge[k]]:
+                    return path
+
+        paths = []
+        counts = []
+        # Chains start at ends; whatever is left over is closed loops.
+        for through in (False, True):
+            for start in range(self.n_nodes):
+                if is_end(start) == through:
+                    continue
+                for k in range(ptr[start], ptr[start + 1]):
+                    if not used[edge[k]]:
+                        paths.append(walk(start, k))
+                        counts.append(pair_counts[edge[k]])
+
+        if max_vertices is not None:
+            step = max_vertices - 1
+            pieces = [(path[i:i + max_vertices], count) for path, count in zip(paths, counts)
+                      for i in range(0, len(path) - 1, step)]
+            paths = [path for path, _ in pieces]
+            counts = [count for _, count in pieces]
+        sizes = np.array([len(path) for path in paths], dtype=np.int64)
+        offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        vertices = np.fromiter((node for path in paths for node in path), dtype=np.int64, count=int(offsets[-1]))
+        return vertices, offsets, np.array(counts, dtype=np.int64)
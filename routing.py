@@ -0,0 +1,431 @@
+import argparse
+import hashlib
+import heapq
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+from static import *
+from map_cache import CACHE_DIR
+
+EARTH_RADIUS_M = 6_371_000.0
+NUM_LANDMARKS = 8
+ROUTER_VERSION = 1
+
+
+class NoPath(Exception):
+    pass
+
+
+# -------------------------------------------------------------------
+# 1) GRAPH PREPROCESSING
+# -------------------------------------------------------------------
+def strongly_connected_components(indptr, indices):
+    """Label every node with its strongly connected component (iterative Tarjan)."""
+    n = len(indptr) - 1
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    comp = [-1] * n
+    stack = []
+    counter = 0
+    n_comp = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, indptr[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            v, edge = work[-1]
+            if edge < indptr[v + 1]:
+                work[-1] = (v, edge + 1)
+                w = indices[edge]
+                if index[w] == -1:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, indptr[w]))
+                elif on_stack[w] and index[w] < low[v]:
+                    low[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[v] < low[parent]:
+                    low[parent] = low[v]
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    comp[w] = n_comp
+                    if w == v:
+                        break
+                n_comp += 1
+    return np.asarray(comp, dtype=np.int32)
+
+
+def reverse_csr(indptr, indices, lengths):
+    n = len(indptr) - 1
+    sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(indices, kind="stable")
+    rev_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=n), out=rev_indptr[1:])
+    return rev_indptr, sources[order], lengths[order]
+
+
+def dijkstra_all(indptr, indices, lengths, source):
+    n = len(indptr) - 1
+    indptr = indptr.tolist() if isinstance(indptr, np.ndarray) else indptr
+    indices = indices.tolist() if isinstance(indices, np.ndarray) else indices
+    lengths = lengths.tolist() if isinstance(lengths, np.ndarray) else lengths
+    dist = [math.inf] * n
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, v = heapq.heappop(heap)
+        if d > dist[v]:
+            continue
+        for e in range(indptr[v], indptr[v + 1]):
+            w = indices[e]
+            nd = d + lengths[e]
+            if nd < dist[w]:
+                dist[w] = nd
+                heapq.heappush(heap, (nd, w))
+    return np.asarray(dist)
+
+
+def graph_fingerprint(road_graph):
+    h = hashlib.sha256()
+    h.update(repr(ROUTER_VERSION).encode())
+    for a in (road_graph.node_ids, road_graph.indptr, road_graph.indices, road_graph.lengths):
+        h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()[:20]
+
+
+# -------------------------------------------------------------------
+# 2) ROUTER
+# -------------------------------------------------------------------
+class Router:
+    """A* over the CSR road graph with a haversine + ALT landmark heuristic.
+
+    ``from_landmark[k, v]`` is the road distance from landmark k to v and
+    ``to_landmark[k, v]`` from v to landmark k; by the triangle inequality
+    both bound the remaining distance to the target from below. ``component``
+    holds the strongly connected component of every node. A pair in the same
+    component is always connected; otherwise ``reachable`` walks the
+    condensation (the DAG of components), so a one-way feeder can still
+    route into the main network while a dead pair is rejected before any
+    search.
+    """
+
+    def __init__(self, road_graph, component, landmarks, from_landmark, to_landmark):
+        self.road_graph = road_graph
+        self.component = component
+        self.landmarks = landmarks
+        self.from_landmark = from_landmark
+        self.to_landmark = to_landmark
+
+        self._indptr = road_graph.indptr.tolist()
+        self._indices = road_graph.indices.tolist()
+        self._lengths = road_graph.lengths.tolist()
+        self._lat_rad = np.radians(road_graph.lonlat[:, 1])
+        self._lon_rad = np.radians(road_graph.lonlat[:, 0])
+        self._cos_lat = np.cos(self._lat_rad)
+
+        # Condensation DAG: component a -> b when some edge leaves a for b.
+        n_comp = int(component.max()) + 1 if len(component) else 0
+        src = component[road_graph.edge_sources()].astype(np.int64)
+        dst = component[road_graph.indices].astype(np.int64)
+        cross = np.unique(np.column_stack([src, dst])[src != dst], axis=0)
+        comp_indptr = np.zeros(n_comp + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cross[:, 0], minlength=n_comp), out=comp_indptr[1:])
+        self._comp_indptr = comp_indptr.tolist()
+        self._comp_indices = cross[:, 1].tolist()
+        self._component = component.tolist()
+
+        # Search state is reused between queries: an entry is only valid when its
+        # stamp equals the current query's generation.
+        n = road_graph.n_nodes
+        self._dist = [0.0] * n
+        self._parent = [0] * n
+        self._stamp = [0] * n
+        self._generation = 0
+
+    @classmethod
+    def build(cls, road_graph, n_landmarks=NUM_LANDMARKS, seed=0):
+        indptr, indices, lengths = road_graph.indptr, road_graph.indices, road_graph.lengths
+        component = strongly_connected_components(indptr, indices)
+        rev = reverse_csr(indptr, indices, lengths)
+
+        # Farthest-point landmark selection inside the largest component.
+        largest = np.bincount(component).argmax()
+        members = np.flatnonzero(component == largest)
+        rng = random.Random(seed)
+        landmarks = []
+        from_rows, to_rows = [], []
+        closest = np.full(road_graph.n_nodes, np.inf)
+        candidate = int(members[rng.randrange(len(members))])
+        for _ in range(min(n_landmarks, len(members))):
+            landmarks.append(candidate)
+            from_rows.append(dijkstra_all(indptr, indices, lengths, candidate))
+            to_rows.append(dijkstra_all(*rev, candidate))
+            closest = np.minimum(closest, from_rows[-1] + to_rows[-1])
+            in_reach = np.where(np.isfinite(closest[members]), closest[members], -1.0)
+            candidate = int(members[in_reach.argmax()])
+
+        return cls(road_graph, component, np.asarray(landmarks, dtype=np.int32),
+                   np.asarray(from_rows, dtype=np.float64).reshape(-1, road_graph.n_nodes),
+                   np.asarray(to_rows, dtype=np.float64).reshape(-1, road_graph.n_nodes))
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, component=self.component, landmarks=self.landmarks,
+                 from_landmark=self.from_landmark, to_landmark=self.to_landmark)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, road_graph, path):
+        with np.load(path) as f:
+            return cls(road_graph, f["component"], f["landmarks"], f["from_landmark"], f["to_landmark"])
+
+    # ---------------------------------------------------------------
+    def reachable(self, source, target):
+        """True when a directed path leads from ``source`` to ``target``."""
+        start, goal = self._component[source], self._component[target]
+        if start == goal:
+            return True
+        # Tarjan numbers a component after every component it reaches, so
+        # nothing numbered below the goal can lead to it.
+        if start < goal:
+            return False
+        indptr, indices = self._comp_indptr, self._comp_indices
+        seen = {start}
+        stack = [start]
+        while stack:
+            c = stack.pop()
+            for e in range(indptr[c], indptr[c + 1]):
+                d = indices[e]
+                if d == goal:
+                    return True
+                if d > goal and d not in seen:
+                    seen.add(d)
+                    stack.append(d)
+        return False
+
+    def heuristic(self, target):
+        """Lower bound (metres) of the road distance from every node to ``target``."""
+        dlat = self._lat_rad - self._lat_rad[target]
+        dlon = self._lon_rad - self._lon_rad[target]
+        a = np.sin(dlat / 2) ** 2 + self._cos_lat * self._cos_lat[target] * np.sin(dlon / 2) ** 2
+        h = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+        if len(self.landmarks):
+            with np.errstate(invalid="ignore"):
+                forward = self.from_landmark[:, target][:, None] - self.from_landmark
+                backward = self.to_landmark - self.to_landmark[:, target][:, None]
+                alt = np.nan_to_num(np.maximum(forward, backward), nan=0.0, posinf=0.0, neginf=0.0)
+            h = np.maximum(h, alt.max(axis=0))
+        return h
+
+    def route(self, source, target):
+        """Shortest path between node indices as a list of node indices."""
+        if not self.reachable(source, target):
+            raise NoPath(f"node {source} cannot reach node {target}")
+        if source == target:
+            return [source]
+
+        h = self.heuristic(target).tolist()
+        indptr, indices, lengths = self._indptr, self._indices, self._lengths
+        dist, parent, stamp = self._dist, self._parent, self._stamp
+        self._generation += 1
+        gen = self._generation
+
+        dist[source] = 0.0
+        parent[source] = -1
+        stamp[source] = gen
+        heap = [(h[source], 0.0, source)]
+        while heap:
+            _, d, v = heapq.heappop(heap)
+            if v == target:
+                break
+            if d > dist[v]:
+                continue
+            for e in range(indptr[v], indptr[v + 1]):
+                w = indices[e]
+                nd = d + lengths[e]
+                if stamp[w] != gen or nd < dist[w]:
+                    stamp[w] = gen
+                    dist[w] = nd
+                    parent[w] = v
+                    heapq.heappush(heap, (nd + h[w], nd, w))
+        else:
+            raise NoPath(f"node {source} cannot reach node {target}")
+
+        path = [target]
+        while path[-1] != source:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
+
+    def route_length(self, path):
+        total = 0.0
+        for u, v in zip(path, path[1:]):
+            lo, hi = self._indptr[u], self._indptr[u + 1]
+            total += min(self._lengths[e] for e in range(lo, hi) if self._indices[e] == v)
+        return total
+
+
+_router = None
+
+
+def get_router(road_graph=None, cache_dir=CACHE_DIR):
+    """Load the router for the current road graph from the cache, building it once."""
+    global _router
+    if road_graph is None:
+        if _router is not None:
+            return _router
+        road_graph = data.road_graph
+    path = os.path.join(cache_dir, f"router_{graph_fingerprint(road_graph)}.npz")
+    if os.path.exists(path):
+        router = Router.load(road_graph, path)
+    else:
+        router = Router.build(road_graph)
+        router.save(path)
+    if road_graph is data.road_graph:
+        _router = router
+    return router
+
+
+# -------------------------------------------------------------------
+# 3) BATCH ROUTING
+# -------------------------------------------------------------------
+class RouteBatch:
+    """Many routes packed into flat arrays.
+
+    Route ``i`` visits node indices ``nodes[offsets[i]:offsets[i + 1]]``
+    (OSM ids in ``node_ids``, big-map pixels in ``xy`` with the same offsets).
+    ``ok[i]`` is False for pairs that have no path; their slice is empty.
+    """
+
+    def __init__(self, offsets, nodes, node_ids, xy, ok):
+        self.offsets = offsets
+        self.nodes = nodes
+        self.node_ids = node_ids
+        self.xy = xy
+        self.ok = ok
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def route(self, i):
+        return self.nodes[self.offsets[i]:self.offsets[i + 1]]
+
+    def polyline(self, i):
+        return self.xy[self.offsets[i]:self.offsets[i + 1]]
+
+
+def _route_chunk(pairs):
+    router = get_router()
+    sizes = np.zeros(len(pairs), dtype=np.int64)
+    ok = np.zeros(len(pairs), dtype=bool)
+    parts = []
+    for i, (source, target) in enumerate(pairs.tolist()):
+        try:
+            path = router.route(source, target)
+        except NoPath:
+            continue
+        ok[i] = True
+        sizes[i] = len(path)
+        parts.append(path)
+    nodes = np.fromiter((v for path in parts for v in path), dtype=np.int32, count=int(sizes.sum()))
+    return sizes, nodes, ok
+
+
+def route_many(pairs, workers=1, chunk_size=256):
+    """Route every (source, target) node-index pair and pack the results.
+
+    Each worker keeps one Router, so the landmark tables and search state are
+    reused across all of its queries. Pixel polylines are projected in one
+    vectorised pass at the end.
+    """
+    from map_drawer import lonlat_to_bigmap_array
+
+    road_graph = data.road_graph
+    get_router()
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+
+    if workers == 1 or len(chunks) <= 1:
+        results = [_route_chunk(chunk) for chunk in chunks]
+    else:
+        with pool_context().Pool(workers) as pool:
+            results = pool.map(_route_chunk, chunks)
+
+    sizes = np.concatenate([r[0] for r in results]) if results else np.zeros(0, dtype=np.int64)
+    nodes = np.concatenate([r[1] for r in results]) if results else np.zeros(0, dtype=np.int32)
+    ok = np.concatenate([r[2] for r in results]) if results else np.zeros(0, dtype=bool)
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    xy = lonlat_to_bigmap_array(road_graph.lonlat[nodes]).astype(np.float32)
+    return RouteBatch(offsets, nodes, np.asarray(road_graph.node_ids)[nodes], xy, ok)
+
+
+# -------------------------------------------------------------------
+# 4) BENCHMARK
+# -------------------------------------------------------------------
+def benchmark(n_queries=200, seed=0, workers=1):
+    import networkx as nx
+
+    road_graph = data.road_graph
+    start_t = time.perf_counter()
+    router = get_router(road_graph)
+    print(f"Router ready in {time.perf_counter() - start_t:.2f} s "
+          f"({len(router.landmarks)} landmarks, {router.component.max() + 1} components)")
+
+    rng = random.Random(seed)
+    largest = np.flatnonzero(router.component == np.bincount(router.component).argmax())
+    pairs = [(int(rng.choice(largest)), int(rng.choice(largest))) for _ in range(n_queries)]
+
+    start_t = time.perf_counter()
+    paths = [router.route(s, t) for s, t in pairs]
+    router_t = time.perf_counter() - start_t
+
+    graph = data.graph
+    ids = road_graph.node_ids
+    start_t = time.perf_counter()
+    nx_paths = [nx.shortest_path(graph, int(ids[s]), int(ids[t]), weight="length") for s, t in pairs]
+    nx_t = time.perf_counter() - start_t
+
+    nx_lengths = [nx.path_weight(graph, p, "length") if len(p) > 1 else 0.0 for p in nx_paths]
+    mismatches = sum(1 for p, ref in zip(paths, nx_lengths) if abs(router.route_length(p) - ref) > 1e-6)
+    print(f"Router:   {n_queries / router_t:10.1f} routes/s")
+    print(f"NetworkX: {n_queries / nx_t:10.1f} routes/s")
+    print(f"Speedup:  {nx_t / router_t:10.2f}x, length mismatches: {mismatches}")
+
+    if workers != 1:
+        batch_pairs = [(int(rng.choice(largest)), int(rng.choice(largest))) for _ in range(n_queries * 10)]
+        start_t = time.perf_counter()
+        batch = route_many(batch_pairs, workers=workers)
+        batch_t = time.perf_counter() - start_t
+        print(f"route_many ({workers} workers): {len(batch) / batch_t:10.1f} routes/s "
+              f"({int(batch.ok.sum())} routed, {len(batch.nodes)} nodes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the routing index and benchmark it.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes for the route_many batch run")
+    args = parser.parse_args()
+    benchmark(args.queries, args.seed, args.workers)
@@ -0,0 +1,245 @@
+import argparse
+import bisect
+import random
+import time
+
+import numpy as np
+
+SIM_HZ = 30
+# Big-map pixels per second: one pixel per tick, the speed riders used to move per rendered frame.
+RIDER_SPEED = 30.0
+MAX_TICKS_PER_FRAME = 10
+
+
+# -------------------------------------------------------------------
+# 1) ARC-LENGTH ROUTES
+# -------------------------------------------------------------------
+class Route:
+    """A polyline with its cumulative arc length at every vertex.
+
+    ``cum[i]`` is the distance from the start to vertex ``i``, so the point
+    at any distance is one binary search away. Zero-length segments simply
+    repeat a ``cum`` value and are never landed on.
+    """
+
+    def __init__(self, xy):
+        self.xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        seg = np.hypot(*np.diff(self.xy, axis=0).T)
+        self.cum = np.zeros(len(self.xy))
+        np.cumsum(seg, out=self.cum[1:])
+        self.length = float(self.cum[-1])
+        self._cum = self.cum.tolist()
+        self._xy = self.xy.tolist()
+
+    def position_at(self, distance):
+        """(x, y) at ``distance`` along the route, clamped to its ends."""
+        cum = self._cum
+        if distance <= 0.0 or len(cum) == 1:
+            return tuple(self._xy[0])
+        if distance >= self.length:
+            return tuple(self._xy[-1])
+        i = bisect.bisect_right(cum, distance) - 1
+        (x1, y1), (x2, y2) = self._xy[i], self._xy[i + 1]
+        t = (distance - cum[i]) / (cum[i + 1] - cum[i])
+        return x1 + (x2 - x1) * t, y1 + (y2 - y1) * t
+
+    def positions_at(self, distances):
+        """Vectorised ``position_at``: an (N, 2) array for N distances."""
+        d = np.clip(np.asarray(distances, dtype=np.float64), 0.0, self.length)
+        if len(self.cum) == 1:
+            return np.repeat(self.xy, len(d), axis=0)
+        i = np.minimum(np.searchsorted(self.cum, d, side="right") - 1, len(self.cum) - 2)
+        span = self.cum[i + 1] - self.cum[i]
+        t = np.divide(d - self.cum[i], span, out=np.zeros_like(d), where=span > 0)
+        return self.xy[i] + (self.xy[i + 1] - self.xy[i]) * t[:, None]
+
+
+class RouteSet:
+    """Many routes packed into one array for lookups across a whole fleet.
+
+    Vertices of route ``r`` are ``xy[offsets[r]:offsets[r + 1]]``; ``cum``
+    runs across all of them (the jump between two routes counts as zero), so
+    ``positions_at`` finds the segment of every rider with a single
+    ``searchsorted``.
+    """
+
+    def __init__(self, polylines):
+        polylines = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polylines]
+        sizes = np.array([len(p) for p in polylines], dtype=np.int64)
+        self.offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        self.xy = np.concatenate(polylines) if polylines else np.zeros((0, 2))
+        seg = np.hypot(*np.diff(self.xy, axis=0).T)
+        seg[self.offsets[1:-1] - 1] = 0.0
+        self.cum = np.zeros(len(self.xy))
+        np.cumsum(seg, out=self.cum[1:])
+        self.start = self.cum[self.offsets[:-1]]
+        self.lengths = self.cum[self.offsets[1:] - 1] - self.start
+
+    @classmethod
+    def from_batch(cls, batch):
+        """Routes of a ``routing.RouteBatch`` that have at least one edge."""
+        return cls([batch.polyline(i) for i in range(len(batch)) if batch.ok[i] and len(batch.route(i)) > 1])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def route(self, r):
+        return Route(self.xy[self.offsets[r]:self.offsets[r + 1]])
+
+    def positions_at(self, route_ids, distances):
+        """(N, 2) positions of N riders, rider ``k`` being ``distances[k]`` along route ``route_ids[k]``."""
+        route_ids = np.asarray(route_ids, dtype=np.int64)
+        d = np.clip(np.asarray(distances, dtype=np.float64), 0.0, self.lengths[route_ids])
+        first = self.offsets[route_ids]
+        last = self.offsets[route_ids + 1] - 1
+        i = np.searchsorted(self.cum, self.start[route_ids] + d, side="right") - 1
+        i = np.clip(i, first, np.maximum(last - 1, first))
+        j = np.minimum(i + 1, last)
+        span = self.cum[j] - self.cum[i]
+        t = np.divide(self.start[route_ids] + d - self.cum[i], span, out=np.zeros_like(d), where=span > 0)
+        return self.xy[i] + (self.xy[j] - self.xy[i]) * np.clip(t, 0.0, 1.0)[:, None]
+
+
+# -------------------------------------------------------------------
+# 2) RIDERS & FIXED-TIMESTEP LOOP
+# -------------------------------------------------------------------
+class Rider:
+    """Plays a Route back at constant speed.
+
+    ``distance`` is all the state there is: each tick adds
+    ``speed * rate * dt`` and the position is looked up on the route, so
+    ``seek`` and fast-forward (``rate``) come for free. ``x``/``y`` is the
+    position after the last tick and ``prev_x``/``prev_y`` the one before it,
+    so rendering can interpolate between the two.
+    """
+
+    def __init__(self, route, speed=RIDER_SPEED):
+        self.route = route if isinstance(route, Route) else Route(route)
+        self.speed = speed
+        self.rate = 1.0
+        self.distance = 0.0
+        self.x, self.y = self.route.position_at(0.0)
+        self.prev_x, self.prev_y = self.x, self.y
+
+    @property
+    def finished(self):
+        return self.distance >= self.route.length
+
+    def step(self, dt):
+        self.prev_x, self.prev_y = self.x, self.y
+        self.distance = min(self.distance + self.speed * self.rate * dt, self.route.length)
+        self.x, self.y = self.route.position_at(self.distance)
+
+    def seek(self, distance):
+        """Jump to ``distance`` along the route (no interpolation from the old spot)."""
+        self.distance = min(max(distance, 0.0), self.route.length)
+        self.x, self.y = self.route.position_at(self.distance)
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def interpolated(self, alpha):
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+
+
+class Simulation:
+    """Fixed-timestep core: riders advance ``1 / hz`` seconds per tick.
+
+    ``advance(elapsed)`` runs however many whole ticks fit in the real time
+    that passed and returns the fraction of a tick left over, for rendering
+    between the last two states. ``run(seconds)`` steps without any clock,
+    as fast as the CPU allows. The same ticks give the same positions, no
+    matter how they were scheduled.
+    """
+
+    def __init__(self, riders, hz=SIM_HZ, max_ticks=MAX_TICKS_PER_FRAME):
+        self.riders = list(riders)
+        self.dt = 1.0 / hz
+        self.max_ticks = max_ticks
+        self.ticks = 0
+        self.accumulator = 0.0
+
+    @property
+    def time(self):
+        return self.ticks * self.dt
+
+    def step(self):
+        for rider in self.riders:
+            rider.step(self.dt)
+        self.ticks += 1
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        n = 0
+        while self.accumulator >= self.dt and n < self.max_ticks:
+            self.step()
+            self.accumulator -= self.dt
+            n += 1
+        if n == self.max_ticks:
+            # Too far behind (a hitch or a breakpoint): drop the backlog instead of spiralling.
+            self.accumulator = min(self.accumulator, self.dt)
+        return self.accumulator / self.dt
+
+    def run(self, seconds):
+        n = round(seconds / self.dt)
+        for _ in range(n):
+            self.step()
+        return n
+
+
+# -------------------------------------------------------------------
+# 3) HEADLESS CAPACITY RUN
+# -------------------------------------------------------------------
+def random_routes(n_routes, seed=0):
+    """A RouteSet of ``n_routes`` random routes inside the largest road component."""
+    from routing import get_router, route_many
+
+    router = get_router()
+    rng = random.Random(seed)
+    largest = np.flatnonzero(router.component == np.bincount(router.component).argmax())
+    pairs = [(int(rng.choice(largest)), int(rng.choice(largest))) for _ in range(n_routes)]
+    return RouteSet.from_batch(route_many(pairs))
+
+
+def capacity_test(n_riders=10, hours=1.0, seed=0, n_routes=200, hz=SIM_HZ, speed=RIDER_SPEED):
+    """Ride ``n_riders`` for ``hours`` of simulated time with no window; every
+    rider that reaches the end of its route starts the next one.
+
+    Riders are just (route id, distance) arrays here and positions come from
+    one vectorised ``RouteSet.positions_at`` per tick.
+    """
+    routes = random_routes(n_routes, seed)
+    dt = 1.0 / hz
+    route_ids = np.arange(n_riders) % len(routes)
+    distance = np.zeros(n_riders)
+    next_route = n_riders
+    rides = 0
+    travelled = 0.0
+    ticks = round(hours * 3600 / dt)
+
+    start_t = time.perf_counter()
+    for _ in range(ticks):
+        distance += speed * dt
+        done = np.flatnonzero(distance >= routes.lengths[route_ids])
+        if len(done):
+            rides += len(done)
+            travelled += float(routes.lengths[route_ids[done]].sum())
+            route_ids[done] = (next_route + np.arange(len(done))) % len(routes)
+            distance[done] = 0.0
+            next_route += len(done)
+        routes.positions_at(route_ids, distance)
+    elapsed = time.perf_counter() - start_t
+
+    sim_time = ticks * dt
+    print(f"Simulated {sim_time / 3600:.2f} h x {n_riders} riders ({ticks} ticks) in {elapsed:.2f} s: "
+          f"{sim_time / elapsed:.0f}x real time, {ticks * n_riders / elapsed:.0f} rider-ticks/s")
+    print(f"Finished rides: {rides}, distance: {travelled + distance.sum():.0f} px")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the ride simulation headless, faster than real time.")
+    parser.add_argument("--riders", type=int, default=10)
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    capacity_test(args.riders, args.hours, args.seed)
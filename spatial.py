@@ -0,0 +1,194 @@
+import math
+
+import numpy as np
+
+
+class UniformGrid:
+    """Buckets point items into square cells for radius and rectangle queries.
+
+    Items must be hashable; each is stored with its own position, so a query
+    only looks at the cells overlapping the search area and then tests the
+    exact distance of the few items found there.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, item, x, y):
+        if item in self.positions:
+            self.remove(item)
+        self.positions[item] = (x, y)
+        self.cells.setdefault(self._cell(x, y), []).append(item)
+
+    def remove(self, item):
+        x, y = self.positions.pop(item)
+        cell = self._cell(x, y)
+        bucket = self.cells[cell]
+        bucket.remove(item)
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, item, x, y):
+        old_cell = self._cell(*self.positions[item])
+        if old_cell == self._cell(x, y):
+            self.positions[item] = (x, y)
+        else:
+            self.insert(item, x, y)
+
+    def query_rect(self, min_x, min_y, max_x, max_y):
+        cx0, cy0 = self._cell(min_x, min_y)
+        cx1, cy1 = self._cell(max_x, max_y)
+        found = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for item in self.cells.get((cx, cy), ()):
+                    x, y = self.positions[item]
+                    if min_x <= x <= max_x and min_y <= y <= max_y:
+                        found.append(item)
+        return found
+
+    def query_radius(self, x, y, radius):
+        r2 = radius * radius
+        found = []
+        for item in self.query_rect(x - radius, y - radius, x + radius, y + radius):
+            ix, iy = self.positions[item]
+            if (ix - x) ** 2 + (iy - y) ** 2 < r2:
+                found.append(item)
+        return found
+
+
+class _DiskGrid:
+    """Background grid for Poisson-disk sampling: cells of r/sqrt(2) hold at most one point."""
+
+    def __init__(self, width, height, min_dist):
+        self.min_dist = min_dist
+        self.cell = min_dist / math.sqrt(2)
+        self.cols = int(math.ceil(width / self.cell)) + 1
+        self.rows = int(math.ceil(height / self.cell)) + 1
+        self.slots = [-1] * (self.cols * self.rows)
+        self.points = []
+
+    def fits(self, x, y):
+        gx, gy = int(x / self.cell), int(y / self.cell)
+        r2 = self.min_dist * self.min_dist
+        for cy in range(max(gy - 2, 0), min(gy + 3, self.rows)):
+            row = cy * self.cols
+            for cx in range(max(gx - 2, 0), min(gx + 3, self.cols)):
+                i = self.slots[row + cx]
+                if i != -1:
+                    px, py = self.points[i]
+                    if (px - x) ** 2 + (py - y) ** 2 < r2:
+                        return False
+        return True
+
+    def add(self, x, y):
+        self.slots[int(y / self.cell) * self.cols + int(x / self.cell)] = len(self.points)
+        self.points.append((x, y))
+
+
+def poisson_disk_darts(width, height, min_dist, rng, limit, max_attempts):
+    """Uniform random points kept when ``min_dist`` from every earlier one,
+    until ``limit`` are kept or ``max_attempts`` points were tried."""
+    grid = _DiskGrid(width, height, min_dist)
+    for _ in range(max_attempts):
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        if grid.fits(x, y):
+            grid.add(x, y)
+            if len(grid.points) >= limit:
+                break
+    return grid.points
+
+
+def poisson_disk_sample(width, height, min_dist, rng, k=30, limit=None, seeds=None):
+    """Bridson's algorithm: points in [0, width) x [0, height) at least
+    ``min_dist`` apart, grown outwards from ``seeds`` (or one random point).
+
+    Without ``limit`` the result is maximal; with it the growth stops once
+    ``limit`` points exist, so the cost follows the points returned, not
+    the area.
+    """
+    grid = _DiskGrid(width, height, min_dist)
+    for x, y in seeds or [(rng.uniform(0, width), rng.uniform(0, height))]:
+        if grid.fits(x, y):
+            grid.add(x, y)
+    active = list(range(len(grid.points)))
+    while active and (limit is None or len(grid.points) < limit):
+        slot = rng.randrange(len(active))
+        ax, ay = grid.points[active[slot]]
+        for _ in range(k):
+            angle = rng.uniform(0, 2 * math.pi)
+            dist = rng.uniform(min_dist, 2 * min_dist)
+            x = ax + dist * math.cos(angle)
+            y = ay + dist * math.sin(angle)
+            if 0 <= x < width and 0 <= y < height and grid.fits(x, y):
+                active.append(len(grid.points))
+                grid.add(x, y)
+                break
+        else:
+            active[slot] = active[-1]
+            active.pop()
+    return grid.points
+
+
+def poisson_disk_subset(candidates, width, height, min_dist, rng, limit=None):
+    """Random sequential pick of candidate points, keeping those ``min_dist``
+    apart, until ``limit`` are chosen or candidates run out."""
+    order = list(range(len(candidates)))
+    rng.shuffle(order)
+    grid = _DiskGrid(width, height, min_dist)
+    for i in order:
+        x, y = candidates[i]
+        if 0 <= x < width and 0 <= y < height and grid.fits(x, y):
+            grid.add(x, y)
+            if limit is not None and len(grid.points) >= limit:
+                break
+    return grid.points
+
+
+class PackedGrid:
+    """Uniform grid over many moving points, rebuilt in one vectorised pass.
+
+    ``build`` counting-sorts the points by cell (CSR layout: ``order`` holds
+    point indices grouped by cell, ``starts`` where each cell begins), so a
+    rectangle query reads one contiguous slice per grid row instead of
+    touching every point. Rebuilding each tick is cheaper than moving
+    thousands of points between the buckets of a UniformGrid.
+    """
+
+    def __init__(self, cell_size, width, height):
+        self.cell_size = cell_size
+        self.cols = int(math.ceil(width / cell_size)) + 1
+        self.rows = int(math.ceil(height / cell_size)) + 1
+        self.xy = np.zeros((0, 2))
+        self.order = np.zeros(0, dtype=np.int64)
+        self.starts = np.zeros(self.cols * self.rows + 1, dtype=np.int64)
+
+    def build(self, xy):
+        self.xy = xy
+        cx = np.clip((xy[:, 0] // self.cell_size).astype(np.int64), 0, self.cols - 1)
+        cy = np.clip((xy[:, 1] // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        cell = cy * self.cols + cx
+        self.order = np.argsort(cell, kind="stable")
+        np.cumsum(np.bincount(cell, minlength=self.cols * self.rows), out=self.starts[1:])
+
+    def query_rect(self, min_x, min_y, max_x, max_y):
+        """Indices of the points inside the rectangle."""
+        cs = self.cell_size
+        cx0 = min(max(int(min_x // cs), 0), self.cols - 1)
+        cx1 = min(max(int(max_x // cs), 0), self.cols - 1)
+        cy0 = min(max(int(min_y // cs), 0), self.rows - 1)
+        cy1 = min(max(int(max_y // cs), 0), self.rows - 1)
+        parts = [self.order[self.starts[cy * self.cols + cx0]:self.starts[cy * self.cols + cx1 + 1]]
+                 for cy in range(cy0, cy1 + 1)]
+        found = np.concatenate(parts) if parts else self.order[:0]
+        x = self.xy[found, 0]
+        y = self.xy[found, 1]
+        return found[(x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y)]
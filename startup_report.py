@@ -0,0 +1,44 @@
+import importlib
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+GAME_MODULES = ("static", "hatching", "map_cache", "map_drawer", "tiles",
+                "user", "markers", "menu", "candy_display", "game_loop")
+
+
+def main():
+    rows = []
+    total_t = time.perf_counter()
+    for name in GAME_MODULES:
+        before = set(sys.modules)
+        start_t = time.perf_counter()
+        importlib.import_module(name)
+        elapsed = time.perf_counter() - start_t
+        pulled_in = len(set(sys.modules) - before)
+        rows.append((f"import {name}", elapsed, f"{pulled_in} modules"))
+
+    from static import data
+    import map_drawer
+    for label, load in (("road graph", lambda: data.road_graph),
+                        ("networkx graph", lambda: data.graph),
+                        ("geometry store", lambda: data.store),
+                        ("map features", map_drawer.load_features)):
+        start_t = time.perf_counter()
+        load()
+        rows.append((f"first access: {label}", time.perf_counter() - start_t, ""))
+    total_t = time.perf_counter() - total_t
+
+    print(f"{'step':40s} {'seconds':>8s}")
+    for label, elapsed, note in rows:
+        print(f"{label:40s} {elapsed:8.3f}  {note}")
+    print("\nBreakdown of data loading:")
+    for label, elapsed in data.timings.items():
+        print(f"  {label:38s} {elapsed:8.3f}")
+    print(f"{'total':40s} {total_t:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
-import osmnx as ox
-import geopandas as gpd
+import contextlib
+import functools
+import os
+import time
 
 WIDTH, HEIGHT = 400, 600
 
@@ -12,8 +14,110 @@ BUILDING_HATCH = (180, 180, 180)
 BIG_MAP_WIDTH = 4000
 BIG_MAP_HEIGHT = 4000
 
+ROADS_FILE = "moscow_roads_tverskoy.graphml"
+BUILDINGS_FILE = "moscow_buildings_tverskoy.geojson"
+GREEN_FILE = "moscow_green_tverskoy.geojson"
+BUNDLE_FILE = "moscow_tverskoy.ytbundle"
+HUD_FONT_FILE = "hud_font.ttf"
+
 global_candy_counter = 0
 
-graph = ox.load_graphml("moscow_roads_tverskoy.graphml")
-buildings = gpd.read_file("moscow_buildings_tverskoy.geojson")
-green_areas = gpd.read_file("moscow_green_tverskoy.geojson")
\ No newline at end of file
+
+class MapData:
+    """Lazily loaded map inputs.
+
+    Nothing is imported or read until a property is first accessed; osmnx and
+    geopandas are only imported by the properties that need them. Every step
+    is timed into ``timings`` (name -> seconds) for the startup report.
+
+    ``road_graph`` and ``store`` come from the preprocessed bundle (see
+    preprocess.py) when it exists and is newer than the source files, and
+    are built from the GraphML/GeoJSON otherwise.
+    """
+
+    def __init__(self, roads_file=ROADS_FILE, buildings_file=BUILDINGS_FILE, green_file=GREEN_FILE,
+                 bundle_file=BUNDLE_FILE):
+        self.roads_file = roads_file
+        self.buildings_file = buildings_file
+        self.green_file = green_file
+        self.bundle_file = bundle_file
+        self.timings = {}
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        start_t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start_t
+
+    @functools.cached_property
+    def graph(self):
+        with self.timed("import osmnx"):
+            import osmnx as ox
+        with self.timed("load graph"):
+            return ox.load_graphml(self.roads_file)
+
+    @functools.cached_property
+    def buildings(self):
+        with self.timed("import geopandas"):
+            import geopandas as gpd
+        with self.timed("load buildings"):
+            return gpd.read_file(self.buildings_file)
+
+    @functools.cached_property
+    def green_areas(self):
+        with self.timed("import geopandas"):
+            import geopandas as gpd
+        with self.timed("load green areas"):
+            return gpd.read_file(self.green_file)
+
+    @functools.cached_property
+    def bundle(self):
+        if not os.path.exists(self.bundle_file):
+            return None
+        bundle_mtime = os.path.getmtime(self.bundle_file)
+        for path in (self.roads_file, self.buildings_file, self.green_file):
+            if os.path.exists(path) and os.path.getmtime(path) > bundle_mtime:
+                print(f"{self.bundle_file} is older than {path}, ignoring it. Re-run preprocess.py")
+                return None
+        with self.timed("open bundle"):
+            from bundle import MapBundle
+            return MapBundle(self.bundle_file)
+
+    @functools.cached_property
+    def road_graph(self):
+        if self.bundle is not None:
+            return self.bundle.road_graph()
+        graph = self.graph
+        with self.timed("build road graph"):
+            from road_graph import RoadGraph
+            return RoadGraph.from_networkx(graph)
+
+    @functools.cached_property
+    def store(self):
+        if self.bundle is not None:
+            return self.bundle.store()
+        green_areas = self.green_areas
+        buildings = self.buildings
+        with self.timed("build geometry store"):
+            from geometry_store import GeometryStore
+            return GeometryStore.from_geodataframes([green_areas, buildings])
+
+
+data = MapData()
+
+
+def pool_context():
+    """Multiprocessing context for worker pools: fork where the platform has
+    it, so workers inherit whatever the parent already loaded."""
+    import multiprocessing
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def __getattr__(name):
+    if name in ("graph", "buildings", "green_areas", "store", "road_graph"):
+        return getattr(data, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,26 +1,23 @@
-import osmnx as ox
 import pygame
-import geopandas as gpd
-from shapely.geometry import Polygon, MultiPolygon, LineString
-import math
+import numpy as np
+from hatching import hatch_polygon, draw_segments
+import geometry_store
 import random
-import time
+from profiler import profiler
 from static import *
 
 # -------------------------------
-# 1. LOAD MAP DATA, BUILDINGS, AND GREEN AREAS
+# 1. MAP DATA (loaded by static)
 # -------------------------------
-graph = ox.load_graphml("moscow_roads_tverskoy.graphml")
-buildings = gpd.read_file("moscow_buildings_tverskoy.geojson")
-green_areas = gpd.read_file("moscow_green_tverskoy.geojson")
-
-node_positions = {node: (data['x'], data['y']) for node, data in graph.nodes(data=True)}
+road_graph = data.road_graph
+store = data.store
 # -------------------------------
 # 2. SETUP PYGAME
 # -------------------------------
 
-start_cord = list(node_positions.values())[-1]
+start_cord = tuple(road_graph.lonlat[-1].tolist())
 scale = 100000
+VIEW_MARGIN = 10
 
 
 def latlon_to_screen(lon, lat, offset_x=0, offset_y=0):
@@ -29,12 +26,57 @@ def latlon_to_screen(lon, lat, offset_x=0, offset_y=0):
     return int(x), int(y)
 
 
-def is_on_screen(points):
-    xs = [pt[0] for pt in points]
-    ys = [pt[1] for pt in points]
-    if max(xs) < 0 or min(xs) > WIDTH or max(ys) < 0 or min(ys) > HEIGHT:
-        return False
-    return True
+def lonlat_to_screen_array(lonlat, offset_x=0, offset_y=0):
+    screen_xy = np.empty(lonlat.shape, dtype=np.int64)
+    screen_xy[:, 0] = ((lonlat[:, 0] - start_cord[0]) * scale + offset_x).astype(np.int64)
+    screen_xy[:, 1] = ((start_cord[1] - lonlat[:, 1]) * scale + offset_y).astype(np.int64)
+    return screen_xy
+
+
+def screen_to_lonlat_bounds(offset_x, offset_y, margin=VIEW_MARGIN):
+    """Lon/lat (min_lon, min_lat, max_lon, max_lat) seen on screen, grown by ``margin`` pixels."""
+    min_lon = (-margin - offset_x) / scale + start_cord[0]
+    max_lon = (WIDTH + margin - offset_x) / scale + start_cord[0]
+    min_lat = start_cord[1] - (HEIGHT + margin - offset_y) / scale
+    max_lat = start_cord[1] - (-margin - offset_y) / scale
+    return min_lon, min_lat, max_lon, max_lat
+
+
+class ViewportIndex:
+    """STRtree over the lon/lat bounds of every store ring and road edge.
+
+    Feature ids follow draw order: rings first (layer by layer), then one id
+    per road edge. ``query`` returns the ids overlapping a lon/lat box,
+    sorted, so a redraw only ever touches what is on screen.
+    """
+
+    def __init__(self, store, road_graph):
+        import shapely
+
+        sources = road_graph.edge_sources()
+        a = road_graph.lonlat[sources]
+        b = road_graph.lonlat[road_graph.indices]
+        road_bounds = np.hstack([np.minimum(a, b), np.maximum(a, b)])
+        bounds = np.concatenate([store.ring_bounds(), road_bounds])
+
+        self.n_rings = store.n_rings
+        self.ring_layer = store.ring_layer()
+        self.edges = np.column_stack([sources, road_graph.indices])
+        self.tree = shapely.STRtree(shapely.box(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3]))
+        self._box = shapely.box
+
+    def query(self, min_lon, min_lat, max_lon, max_lat):
+        return np.sort(self.tree.query(self._box(min_lon, min_lat, max_lon, max_lat)))
+
+
+_viewport_index = None
+
+
+def viewport_index():
+    global _viewport_index
+    if _viewport_index is None:
+        _viewport_index = ViewportIndex(store, road_graph)
+    return _viewport_index
 
 
 # -------------------------------
@@ -50,49 +92,15 @@ def draw_sketch_line(surface, color, start, end, thickness=1, roughness=3, itera
         pygame.draw.aaline(surface, color, (sx, sy), (ex, ey), thickness)
 
 
-def draw_hatch_lines(surface, poly, hatch_spacing, hatch_angle, color, thickness=1):
-    theta = math.radians(hatch_angle)
-    nx = -math.sin(theta)
-    ny = math.cos(theta)
-    min_x, min_y, max_x, max_y = poly.bounds
-    corners = [(min_x, min_y), (min_x, max_y), (max_x, min_y), (max_x, max_y)]
-    c_values = [nx * x + ny * y for (x, y) in corners]
-    c_min, c_max = min(c_values), max(c_values)
-
-    center = ((min_x + max_x) / 2, (min_y + max_y) / 2)
-    dx = math.cos(theta)
-    dy = math.sin(theta)
-    L = math.sqrt((max_x - min_x) ** 2 + (max_y - min_y) ** 2) * 1.5
-
-    c = c_min - hatch_spacing
-    while c < c_max + hatch_spacing:
-        center_proj = nx * center[0] + ny * center[1]
-        d = c - center_proj
-        p0 = (center[0] + d * nx, center[1] + d * ny)
-        p1 = (p0[0] - L * dx, p0[1] - L * dy)
-        p2 = (p0[0] + L * dx, p0[1] + L * dy)
-        line = LineString([p1, p2])
-        if not poly.is_valid:
-            continue
-        inter = poly.intersection(line)
-        if not inter.is_empty:
-            if inter.geom_type == 'LineString':
-                coords = list(inter.coords)
-                if len(coords) >= 2:
-                    pygame.draw.aaline(surface, color, (int(coords[0][0]), int(coords[0][1])),
-                                       (int(coords[-1][0]), int(coords[-1][1])), thickness)
-            elif inter.geom_type == 'MultiLineString':
-                for seg in inter.geoms:
-                    coords = list(seg.coords)
-                    if len(coords) >= 2:
-                        pygame.draw.aaline(surface, color, (int(coords[0][0]), int(coords[0][1])),
-                                           (int(coords[-1][0]), int(coords[-1][1])), thickness)
-        c += hatch_spacing
-
-
-def draw_crosshatch(surface, poly, spacing=10, color=(100, 100, 100), thickness=1):
-    draw_hatch_lines(surface, poly, hatch_spacing=spacing, hatch_angle=45, color=color, thickness=thickness)
-    draw_hatch_lines(surface, poly, hatch_spacing=spacing, hatch_angle=-45, color=color, thickness=thickness)
+def draw_hatch_lines(surface, points, hatch_spacing, hatch_angle, color, thickness=1):
+    segments = hatch_polygon(points, hatch_spacing, hatch_angle)
+    # One-pixel hatching stays anti-aliased; thicker lines need a width.
+    draw_segments(surface, color, segments, width=thickness if thickness > 1 else None, truncate=True)
+
+
+def draw_crosshatch(surface, points, spacing=10, color=(100, 100, 100), thickness=1):
+    draw_hatch_lines(surface, points, hatch_spacing=spacing, hatch_angle=45, color=color, thickness=thickness)
+    draw_hatch_lines(surface, points, hatch_spacing=spacing, hatch_angle=-45, color=color, thickness=thickness)
 
 
 def draw_sketch_crosshatch_polygon(surface, outline_color, points,
@@ -100,8 +108,7 @@ def draw_sketch_crosshatch_polygon(surface, outline_color, points,
                                    hatch_spacing=10, hatch_color=None):
     if hatch_color is None:
         hatch_color = outline_color
-    poly = Polygon(points)
-    draw_crosshatch(surface, poly, spacing=hatch_spacing, color=hatch_color, thickness=1)
+    draw_crosshatch(surface, points, spacing=hatch_spacing, color=hatch_color, thickness=1)
     for i in range(len(points)):
         start_pt = points[i]
         end_pt = points[(i + 1) % len(points)]
@@ -113,83 +120,35 @@ def draw_sketch_crosshatch_polygon(surface, outline_color, points,
 # 4. DRAW MAP FUNCTION (GREEN AREAS, BUILDINGS, AND ROADS)
 # -------------------------------
 def draw_map(screen, offset_x=0, offset_y=0):
-    start_time = time.perf_counter()
-    for idx, row in green_areas.iterrows():
-        geom = row['geometry']
-        if geom is None:
-            continue
-        if isinstance(geom, Polygon):
-            coords = list(geom.exterior.coords)
-            screen_coords = [latlon_to_screen(*pt, offset_x=offset_x, offset_y=offset_y) for pt in coords]
-            if is_on_screen(screen_coords):
-                draw_sketch_crosshatch_polygon(screen,
-                                               GREEN_OUTLINE,
-                                               screen_coords,
-                                               outline_thickness=1,
-                                               roughness=2,
-                                               iterations=2,
-                                               hatch_spacing=10,
-                                               hatch_color=GREEN_HATCH)
-        elif isinstance(geom, MultiPolygon):
-            for poly in geom.geoms:
-                coords = list(poly.exterior.coords)
-                screen_coords = [latlon_to_screen(*pt, offset_x=offset_x, offset_y=offset_y) for pt in coords]
-                if is_on_screen(screen_coords):
-                    draw_sketch_crosshatch_polygon(screen,
-                                                   GREEN_OUTLINE,
-                                                   screen_coords,
-                                                   outline_thickness=1,
-                                                   roughness=2,
-                                                   iterations=2,
-                                                   hatch_spacing=10,
-                                                   hatch_color=GREEN_HATCH)
-    end_time = time.perf_counter()
-    print(f"Green area time: {end_time - start_time:.4f} seconds")
-
-    start_time = time.perf_counter()
-    for idx, row in buildings.iterrows():
-        geom = row['geometry']
-        if geom is None:
-            continue
-        if isinstance(geom, Polygon):
-            coords = list(geom.exterior.coords)
-            screen_coords = [latlon_to_screen(*pt, offset_x=offset_x, offset_y=offset_y) for pt in coords]
-            if is_on_screen(screen_coords):
+    index = viewport_index()
+    with profiler.span("draw_map.query"):
+        ids = index.query(*screen_to_lonlat_bounds(offset_x, offset_y))
+    ring_ids = ids[ids < index.n_rings]
+
+    for layer, outline_color, hatch_color, label in (
+            (geometry_store.GREEN, GREEN_OUTLINE, GREEN_HATCH, "draw_map.green"),
+            (geometry_store.BUILDINGS, BUILDING_OUTLINE, BUILDING_HATCH, "draw_map.buildings")):
+        with profiler.span(label):
+            for ring in ring_ids[index.ring_layer[ring_ids] == layer].tolist():
+                ring_lonlat = store.coords[store.ring_offsets[ring]:store.ring_offsets[ring + 1]]
+                screen_coords = lonlat_to_screen_array(ring_lonlat, offset_x, offset_y).tolist()
                 draw_sketch_crosshatch_polygon(screen,
-                                               BUILDING_OUTLINE,
+                                               outline_color,
                                                screen_coords,
                                                outline_thickness=1,
                                                roughness=2,
                                                iterations=2,
                                                hatch_spacing=10,
-                                               hatch_color=BUILDING_HATCH)
-        elif isinstance(geom, MultiPolygon):
-            for poly in geom.geoms:
-                coords = list(poly.exterior.coords)
-                screen_coords = [latlon_to_screen(*pt, offset_x=offset_x, offset_y=offset_y) for pt in coords]
-                if is_on_screen(screen_coords):
-                    draw_sketch_crosshatch_polygon(screen,
-                                                   BUILDING_OUTLINE,
-                                                   screen_coords,
-                                                   outline_thickness=1,
-                                                   roughness=2,
-                                                   iterations=2,
-                                                   hatch_spacing=10,
-                                                   hatch_color=BUILDING_HATCH)
-    end_time = time.perf_counter()
-    print(f"Building area time: {end_time - start_time:.4f} seconds")
-
-    start_time = time.perf_counter()
-    for u, v in graph.edges():
-        start_pos = latlon_to_screen(*node_positions[u], offset_x=offset_x, offset_y=offset_y)
-        end_pos = latlon_to_screen(*node_positions[v], offset_x=offset_x, offset_y=offset_y)
-        if is_on_screen([start_pos, end_pos]):
+                                               hatch_color=hatch_color)
+
+    with profiler.span("draw_map.roads"):
+        edges = index.edges[ids[ids >= index.n_rings] - index.n_rings]
+        start_xy = lonlat_to_screen_array(road_graph.lonlat[edges[:, 0]], offset_x, offset_y).tolist()
+        end_xy = lonlat_to_screen_array(road_graph.lonlat[edges[:, 1]], offset_x, offset_y).tolist()
+        for start_pos, end_pos in zip(start_xy, end_xy):
             draw_sketch_line(screen,
                              ROAD_COLOR,
                              start_pos, end_pos,
                              thickness=2,
                              roughness=2,
                              iterations=2)
-    end_time = time.perf_counter()
-    print(f"Roads time: {end_time - start_time:.4f} seconds")
-
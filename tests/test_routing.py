@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from road_graph import RoadGraph
+from routing import NoPath, Router
+
+
+def one_way_feeder():
+    """0 -> 1 is one-way into the two-way street 1 <-> 2 <-> 3."""
+    edges = [(0, 1), (1, 2), (2, 1), (2, 3), (3, 2)]
+    src = np.array([u for u, _ in edges])
+    dst = np.array([v for _, v in edges], dtype=np.int32)
+    indptr = np.zeros(5, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=4), out=indptr[1:])
+    order = np.argsort(src, kind="stable")
+    lonlat = np.array([(37.600 + 0.001 * i, 55.750) for i in range(4)])
+    return RoadGraph(np.arange(4), lonlat, indptr, dst[order], np.full(len(edges), 70.0))
+
+
+def test_routes_out_of_a_one_way_feeder():
+    router = Router.build(one_way_feeder())
+    assert router.component[0] != router.component[3]
+    assert router.reachable(0, 3)
+    assert router.route(0, 3) == [0, 1, 2, 3]
+
+
+def test_rejects_the_wrong_way_up_a_feeder():
+    router = Router.build(one_way_feeder())
+    assert not router.reachable(3, 0)
+    with pytest.raises(NoPath):
+        router.route(3, 0)
@@ -0,0 +1,114 @@
+import collections
+import math
+import pygame
+from static import *
+from map_drawer import render_region
+
+TILE_SIZE = 256
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+ZOOM_LEVELS = (0.25, 0.5, 1.0, 2.0)
+
+
+def pyramid_level(zoom, levels=ZOOM_LEVELS):
+    """The pyramid level nearest to ``zoom`` (in log scale) and the residual
+    scale ``zoom / level`` left to apply to the viewport crop."""
+    level = min(levels, key=lambda lv: abs(math.log(zoom / lv)))
+    return level, zoom / level
+
+
+class TileCache:
+    """Renders the base map lazily in square tiles keyed by (zoom, tx, ty).
+
+    Tiles are rendered the first time they intersect the viewport and kept in
+    an LRU bounded by ``max_bytes``; the least recently drawn tiles are evicted.
+    Zoom only ever uses the fixed ``ZOOM_LEVELS`` (see ``pyramid_level``), so
+    each level is a pyramid layer rendered natively at its own resolution.
+    With a ``disk_cache`` (a ``MapCache``) tiles are also persisted, so a warm
+    start only has to read them back.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE, max_bytes=TILE_CACHE_BYTES, seed=0, disk_cache=None):
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.seed = seed
+        self.disk_cache = disk_cache
+        self.tiles = collections.OrderedDict()
+        self.bytes_used = 0
+        self.rendered = 0
+        self.evicted = 0
+
+    @staticmethod
+    def zoom_key(zoom):
+        return round(zoom, 3)
+
+    def tile_bytes(self):
+        return self.tile_size * self.tile_size * 4
+
+    def get_tile(self, zoom, tx, ty):
+        key = (self.zoom_key(zoom), tx, ty)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+
+        tile = None
+        if self.disk_cache is not None:
+            name = f"tile{self.tile_size}_z{key[0]}_{tx}_{ty}_s{self.seed}"
+            tile = self.disk_cache.load_surface(name)
+        if tile is None:
+            tile = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+            tile.fill(WHITE)
+            render_region(tile, tx * self.tile_size, ty * self.tile_size, key[0], self.seed)
+            self.rendered += 1
+            if self.disk_cache is not None:
+                self.disk_cache.save_surface(name, tile)
+
+        self.tiles[key] = tile
+        self.bytes_used += self.tile_bytes()
+        self.evict()
+        return tile
+
+    def evict(self):
+        while self.bytes_used > self.max_bytes and len(self.tiles) > 1:
+            self.tiles.popitem(last=False)
+            self.bytes_used -= self.tile_bytes()
+            self.evicted += 1
+
+    def visible_tiles(self, pan_x, pan_y, zoom, width=WIDTH, height=HEIGHT):
+        """Yield (tx, ty) of every tile overlapping a ``width`` x ``height`` viewport."""
+        ts = self.tile_size
+        map_w = int(BIG_MAP_WIDTH * zoom)
+        map_h = int(BIG_MAP_HEIGHT * zoom)
+        left = max(0, -pan_x)
+        top = max(0, -pan_y)
+        right = min(map_w, -pan_x + width)
+        bottom = min(map_h, -pan_y + height)
+        if right <= left or bottom <= top:
+            return
+        for ty in range(int(top) // ts, (int(bottom) - 1) // ts + 1):
+            for tx in range(int(left) // ts, (int(right) - 1) // ts + 1):
+                yield tx, ty
+
+    def prerender(self, zoom):
+        """Render (or load) every tile of one pyramid level; returns how many
+        had to be rendered. Meant for filling the disk cache ahead of time."""
+        rendered = self.rendered
+        ts = self.tile_size
+        for ty in range(math.ceil(BIG_MAP_HEIGHT * zoom / ts)):
+            for tx in range(math.ceil(BIG_MAP_WIDTH * zoom / ts)):
+                self.get_tile(zoom, tx, ty)
+        return self.rendered - rendered
+
+    def draw(self, screen, pan_x, pan_y, zoom=1.0):
+        width, height = screen.get_size()
+        ts = self.tile_size
+        for tx, ty in self.visible_tiles(pan_x, pan_y, zoom, width, height):
+            tile = self.get_tile(zoom, tx, ty)
+            screen.blit(tile, (tx * ts + pan_x, ty * ts + pan_y))
+
+    def draw_rect(self, target, rect, pan_x, pan_y, zoom=1.0):
+        """Blit only the tiles overlapping ``rect`` (in ``target`` coordinates)."""
+        ts = self.tile_size
+        for tx, ty in self.visible_tiles(pan_x - rect.x, pan_y - rect.y, zoom, rect.width, rect.height):
+            tile = self.get_tile(zoom, tx, ty)
+            target.blit(tile, (tx * ts + pan_x, ty * ts + pan_y))